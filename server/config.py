@@ -4,11 +4,123 @@ Loads and validates system configuration from YAML file
 """
 
 import os
-import yaml
 import logging
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
 from pathlib import Path
 
+import orjson
+
+
+# PyYAML is imported lazily so warm starts served from the config cache
+# never pay its import cost
+
+def _yaml_loader():
+    """Return the libyaml C loader when available, else the pure-Python one"""
+    try:
+        from yaml import CSafeLoader as loader
+    except ImportError:
+        from yaml import SafeLoader as loader
+    return loader
+
+
+def _yaml_dumper():
+    """Return the libyaml C dumper when available, else the pure-Python one"""
+    try:
+        from yaml import CSafeDumper as dumper
+    except ImportError:
+        from yaml import SafeDumper as dumper
+    return dumper
+
+
+def _freeze(config: Dict[str, Any]) -> Mapping[str, Any]:
+    """Recursively wrap a nested configuration in read-only mapping proxies"""
+    return MappingProxyType({
+        key: _freeze(value) if isinstance(value, dict) else value
+        for key, value in config.items()
+    })
+
+
+def _thaw(config: Mapping[str, Any]) -> Dict[str, Any]:
+    """Recursively copy a nested read-only configuration into plain dictionaries"""
+    return {
+        key: _thaw(value) if isinstance(value, Mapping) else value
+        for key, value in config.items()
+    }
+
+
+# Built once at import; nested proxies keep callers from mutating the shared copy
+_DEFAULT_CONFIG = _freeze({
+    'serial': {
+        'port': '/dev/ttyACM0',
+        'baudrate': 115200,
+        'timeout': 2,
+        'reconnect_interval': 5
+    },
+    'mqtt': {
+        'broker': 'localhost',
+        'port': 1883,
+        'keepalive': 60,
+        'client_id': 'curtain_control_rpi',
+        'topics': {
+            'light_reading': 'curtain/light/reading',
+            'position_status': 'curtain/position/status',
+            'control_command': 'curtain/control/command',
+            'system_status': 'curtain/system/status',
+            'alerts': 'curtain/alerts/errors',
+            'heartbeat': 'curtain/system/heartbeat'
+        },
+        'publish_interval': {
+            'light': 5,
+            'status': 10,
+            'heartbeat': 30
+        }
+    },
+    'database': {
+        'path': 'curtain_control.db',
+        'retention_days': 30
+    },
+    'server': {
+        'host': '0.0.0.0',
+        'port': 5000,
+        'debug': False,
+        'threads': 12,
+        'max_event_streams': 4,
+        'cors_enabled': True
+    },
+    'curtain': {
+        'auto_mode': False,
+        'thresholds': {
+            'dark': 300,
+            'bright': 700,
+            'hysteresis': 50
+        },
+        'motor': {
+            'default_speed': 100,
+            'timeout': 30
+        },
+        'position': {
+            'default': 'unknown'
+        }
+    },
+    'logging': {
+        'level': 'INFO',
+        'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        'file': 'logs/curtain_control.log',
+        'max_bytes': 10485760,
+        'backup_count': 5,
+        'buffer_capacity': 256
+    },
+    'system': {
+        'timezone': 'UTC',
+        'data_directory': 'data',
+        'enable_simulation': True,
+        'realtime': False,
+        'realtime_priority': 20,
+        'realtime_cpu': None
+    }
+})
+
 
 class ConfigManager:
     """Manages application configuration with validation"""
@@ -21,7 +133,9 @@ class ConfigManager:
             config_path: Path to YAML configuration file
         """
         self.config_path = config_path
+        self.cache_path = f"{config_path}.cache.json"
         self.config: Dict[str, Any] = {}
+        self._flat: Dict[str, Any] = {}
         self.logger = logging.getLogger(__name__)
         
     def load(self) -> Dict[str, Any]:
@@ -40,25 +154,130 @@ class ConfigManager:
             return self._get_default_config()
         
         try:
-            with open(self.config_path, 'r') as f:
-                self.config = yaml.safe_load(f)
-                self.logger.info(f"Configuration loaded from {self.config_path}")
+            stat = os.stat(self.config_path)
+            cached = self._read_cache(stat)
+            
+            if cached is not None:
+                self.config = cached
+                self.logger.info(f"Configuration loaded from cache {self.cache_path}")
+            else:
+                import yaml
+                try:
+                    with open(self.config_path, 'r') as f:
+                        self.config = yaml.load(f, Loader=_yaml_loader())
+                        self.logger.info(f"Configuration loaded from {self.config_path}")
+                except yaml.YAMLError as e:
+                    self.logger.error(f"Error parsing config file: {e}")
+                    return self._get_default_config()
                 
             # Validate configuration
             self._validate_config()
+            self._flat = self._flatten(self.config)
+            
+            # Only cache configurations that passed validation
+            if cached is None:
+                self._write_cache(stat)
             
             # Create necessary directories
             self._create_directories()
             
             return self.config
             
-        except yaml.YAMLError as e:
-            self.logger.error(f"Error parsing config file: {e}")
-            return self._get_default_config()
         except Exception as e:
             self.logger.error(f"Unexpected error loading config: {e}")
             return self._get_default_config()
     
+    def _read_cache(self, stat: os.stat_result) -> Optional[Dict[str, Any]]:
+        """
+        Read parsed configuration from the JSON sidecar
+        
+        JSON rather than pickle, so a tampered cache can at worst yield bad
+        values (still validated) but never run code.
+        
+        Args:
+            stat: Current stat of the YAML config file
+            
+        Returns:
+            Cached configuration if it matches the config file, None otherwise
+        """
+        try:
+            with open(self.cache_path, 'rb') as f:
+                cache = orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.debug(f"Ignoring unreadable config cache: {e}")
+            return None
+        
+        if not isinstance(cache, dict) or cache.get('source') != [stat.st_mtime_ns, stat.st_size]:
+            return None
+        
+        config = cache.get('config')
+        return config if isinstance(config, dict) else None
+    
+    def _write_cache(self, stat: os.stat_result):
+        """
+        Atomically write parsed configuration to the JSON sidecar
+        
+        Configurations JSON cannot hold exactly, such as YAML dates or
+        non-string keys, are not cached, so warm and cold starts always see
+        the same values.
+        
+        Args:
+            stat: Stat of the YAML config file the configuration was parsed from
+        """
+        try:
+            encoded = orjson.dumps(self.config)
+            lossless = orjson.loads(encoded) == self.config
+        except (orjson.JSONEncodeError, orjson.JSONDecodeError):
+            lossless = False
+        if not lossless:
+            self.logger.debug("Configuration does not round-trip through JSON, not caching it")
+            return
+        
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(b'{"source":%s,"config":%s}' % (
+                    orjson.dumps([stat.st_mtime_ns, stat.st_size]), encoded))
+            os.replace(tmp_path, self.cache_path)
+            self.logger.debug(f"Wrote config cache: {self.cache_path}")
+        except Exception as e:
+            self.logger.warning(f"Failed to write config cache: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+    
+    def _invalidate_cache(self, path: str):
+        """Remove the JSON sidecar belonging to a config file"""
+        try:
+            os.remove(f"{path}.cache.json")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            self.logger.warning(f"Failed to remove config cache: {e}")
+    
+    @staticmethod
+    def _flatten(config: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+        """
+        Build a dot-notation lookup table for a nested configuration
+        
+        Args:
+            config: Nested configuration dictionary
+            prefix: Key path of the dictionary being flattened
+            
+        Returns:
+            Dictionary mapping every key path (sections included) to its value
+        """
+        flat = {}
+        for key, value in config.items():
+            key_path = f"{prefix}{key}"
+            flat[key_path] = value
+            if isinstance(value, dict):
+                flat.update(ConfigManager._flatten(value, f"{key_path}."))
+        return flat
+    
     def _validate_config(self):
         """Validate configuration structure and values"""
         required_sections = ['serial', 'mqtt', 'database', 'server', 'curtain']
@@ -102,76 +321,27 @@ class ConfigManager:
             self.logger.debug(f"Created directory: {directory}")
     
     def _get_default_config(self) -> Dict[str, Any]:
-        """Return default configuration"""
-        return {
-            'serial': {
-                'port': '/dev/ttyACM0',
-                'baudrate': 115200,
-                'timeout': 2,
-                'reconnect_interval': 5
-            },
-            'mqtt': {
-                'broker': 'localhost',
-                'port': 1883,
-                'keepalive': 60,
-                'client_id': 'curtain_control_rpi',
-                'topics': {
-                    'light_reading': 'curtain/light/reading',
-                    'position_status': 'curtain/position/status',
-                    'control_command': 'curtain/control/command',
-                    'system_status': 'curtain/system/status',
-                    'alerts': 'curtain/alerts/errors',
-                    'heartbeat': 'curtain/system/heartbeat'
-                },
-                'publish_interval': {
-                    'light': 5,
-                    'status': 10,
-                    'heartbeat': 30
-                }
-            },
-            'database': {
-                'path': 'curtain_control.db',
-                'retention_days': 30
-            },
-            'server': {
-                'host': '0.0.0.0',
-                'port': 5000,
-                'debug': False,
-                'cors_enabled': True
-            },
-            'curtain': {
-                'auto_mode': False,
-                'thresholds': {
-                    'dark': 300,
-                    'bright': 700,
-                    'hysteresis': 50
-                },
-                'motor': {
-                    'default_speed': 100,
-                    'timeout': 30
-                },
-                'position': {
-                    'default': 'unknown'
-                }
-            },
-            'logging': {
-                'level': 'INFO',
-                'format': '%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-                'file': 'logs/curtain_control.log',
-                'max_bytes': 10485760,
-                'backup_count': 5
-            },
-            'system': {
-                'timezone': 'UTC',
-                'data_directory': 'data',
-                'enable_simulation': True
-            }
-        }
+        """
+        Switch to the default configuration
+        
+        The manager keeps its own mutable copy of the defaults, so set() and
+        callers holding the returned dictionary see the same values.
+        
+        Returns:
+            The default configuration, now also self.config
+        """
+        self.config = _thaw(_DEFAULT_CONFIG)
+        self._flat = self._flatten(self.config)
+        return self.config
     
     def get(self, key_path: str, default: Any = None) -> Any:
         """
         Get configuration value using dot notation
         
+        Values come from a lookup table built on load and on set(); change
+        the configuration through set(), as in-place edits of the config
+        dictionary do not update it.
+        
         Args:
             key_path: Configuration key path (e.g., 'mqtt.broker')
             default: Default value if key not found
@@ -179,15 +349,7 @@ class ConfigManager:
         Returns:
             Configuration value or default
         """
-        keys = key_path.split('.')
-        value = self.config
-        
-        try:
-            for key in keys:
-                value = value[key]
-            return value
-        except (KeyError, TypeError):
-            return default
+        return self._flat.get(key_path, default)
     
     def set(self, key_path: str, value: Any):
         """
@@ -206,6 +368,7 @@ class ConfigManager:
             config = config[key]
         
         config[keys[-1]] = value
+        self._flat = self._flatten(self.config)
         self.logger.debug(f"Configuration updated: {key_path} = {value}")
     
     def save(self, path: Optional[str] = None):
@@ -215,11 +378,14 @@ class ConfigManager:
         Args:
             path: Optional path to save config (defaults to original path)
         """
+        import yaml
+        
         save_path = path or self.config_path
         
         try:
+            self._invalidate_cache(save_path)
             with open(save_path, 'w') as f:
-                yaml.dump(self.config, f, default_flow_style=False, indent=2)
+                yaml.dump(self.config, f, Dumper=_yaml_dumper(), default_flow_style=False, indent=2)
             self.logger.info(f"Configuration saved to {save_path}")
         except Exception as e:
             self.logger.error(f"Error saving configuration: {e}")
@@ -3,16 +3,115 @@ Database Module
 Handles SQLite database operations for data persistence
 """
 
+import atexit
 import sqlite3
 import logging
-from datetime import datetime, timedelta
-from typing import List, Optional, Dict, Any
+import threading
+import time
+from collections import deque
+from typing import Iterator, List, Optional, Dict, Any
 from contextlib import contextmanager
 
 
+# SQL statements are module constants so every call passes sqlite3 the same
+# string and hits the statement cache of the pooled per-thread connection
+_SQL_INSERT_LIGHT_READINGS = '''INSERT INTO light_readings 
+    (timestamp, raw_value, calibrated_value, sensor_id) 
+    VALUES (?, ?, ?, ?)'''
+
+_SQL_RECENT_LIGHT_READINGS = '''SELECT id, datetime(timestamp, 'unixepoch') AS timestamp, 
+        raw_value, calibrated_value, sensor_id 
+    FROM light_readings 
+    WHERE timestamp > ? 
+    ORDER BY timestamp DESC 
+    LIMIT ?'''
+
+_SQL_LIGHT_STATISTICS = '''SELECT 
+        COUNT(*) as count,
+        AVG(raw_value) as average,
+        MIN(raw_value) as minimum,
+        MAX(raw_value) as maximum
+    FROM light_readings 
+    WHERE timestamp > ?'''
+
+_SQL_INSERT_OPERATION = '''INSERT INTO curtain_operations 
+    (timestamp, operation, trigger, light_level_before, light_level_after, 
+     duration_ms, success, error_message) 
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)'''
+
+_SQL_RECENT_OPERATIONS = '''SELECT id, datetime(timestamp, 'unixepoch') AS timestamp, 
+        operation, trigger, light_level_before, light_level_after, 
+        duration_ms, success, error_message 
+    FROM curtain_operations 
+    WHERE timestamp > ? 
+    ORDER BY timestamp DESC 
+    LIMIT ?'''
+
+_SQL_GET_SETTING = 'SELECT setting_value FROM system_config WHERE setting_key = ?'
+
+_SQL_SET_SETTING = '''INSERT OR REPLACE INTO system_config 
+    (setting_key, setting_value, data_type, updated_at) 
+    VALUES (?, ?, ?, CURRENT_TIMESTAMP)'''
+
+_SQL_INSERT_ERROR = '''INSERT INTO error_log 
+    (timestamp, error_type, error_message, component, severity) 
+    VALUES (?, ?, ?, ?, ?)'''
+
+_SQL_RECENT_ERRORS = '''SELECT id, datetime(timestamp, 'unixepoch') AS timestamp, 
+        error_type, error_message, component, severity 
+    FROM error_log 
+    WHERE timestamp > ? 
+    ORDER BY timestamp DESC 
+    LIMIT ?'''
+
+_SQL_DELETE_OLD_LIGHT_READINGS = '''DELETE FROM light_readings WHERE id IN 
+    (SELECT id FROM light_readings WHERE timestamp < ? LIMIT ?)'''
+
+_SQL_DELETE_OLD_OPERATIONS = '''DELETE FROM curtain_operations WHERE id IN 
+    (SELECT id FROM curtain_operations WHERE timestamp < ? LIMIT ?)'''
+
+_SQL_DELETE_OLD_ERRORS = '''DELETE FROM error_log WHERE id IN 
+    (SELECT id FROM error_log WHERE timestamp < ? LIMIT ?)'''
+
+# Tables whose timestamp column holds unix seconds since SCHEMA_VERSION 1
+_TIMESTAMPED_TABLES = ('light_readings', 'curtain_operations', 'error_log')
+
+
 class Database:
     """Database manager for curtain control system"""
     
+    # Stored in PRAGMA user_version; 1 = INTEGER unix-second timestamps
+    SCHEMA_VERSION = 1
+    
+    # Prepared statements kept per connection (sqlite3 defaults to 128)
+    STATEMENT_CACHE_SIZE = 256
+    
+    # Per-connection tuning applied to every new connection
+    CONNECTION_PRAGMAS = (
+        'PRAGMA synchronous=NORMAL',
+        'PRAGMA temp_store=MEMORY',
+        'PRAGMA mmap_size=268435456',
+        'PRAGMA cache_size=-20000',
+        # Pin the checkpoint threshold (pages) so WAL growth stays bounded
+        # no matter how the library was built
+        'PRAGMA wal_autocheckpoint=1000',
+    )
+    
+    # Rows removed per cleanup transaction, bounding how long the write lock
+    # is held and how much the WAL grows
+    CLEANUP_CHUNK_SIZE = 10000
+    
+    # Free pages returned to the filesystem per vacuum() call
+    VACUUM_PAGES = 1000
+    
+    # Buffered light readings are written once this many are pending,
+    # or every LIGHT_FLUSH_INTERVAL seconds, whichever comes first
+    LIGHT_BATCH_SIZE = 500
+    LIGHT_FLUSH_INTERVAL = 2.0
+    
+    # Rows fetched per step when streaming query results
+    READ_BATCH_SIZE = 500
+    
     def __init__(self, db_path: str):
         """
         Initialize database manager
@@ -22,18 +121,45 @@ class Database:
         """
         self.db_path = db_path
         self.logger = logging.getLogger(__name__)
+        
+        # journal_mode is persistent in the database file, so it only
+        # needs to be set by the first connection
+        self._wal_enabled = False
+        
+        # One reusable connection per thread
+        self._tls = threading.local()
+        atexit.register(self.close_thread_connection)
+        
+        # Pending light readings awaiting a batched insert; deque append and
+        # popleft are atomic, so producers never take a lock
+        self._pending = deque()
+        self._flush_event = threading.Event()
+        
         self._initialize_schema()
         
+        self._writer_thread = threading.Thread(target=self._writer_loop, daemon=True,
+                                               name="DB-Writer")
+        self._writer_thread.start()
+        
     @contextmanager
     def get_connection(self):
         """
-        Context manager for database connections
+        Context manager for a transaction on the calling thread's connection
+        
+        The connection is opened on first use by each thread and reused by
+        later calls; the transaction is committed on success and rolled
+        back on error.
         
         Yields:
             sqlite3.Connection: Database connection
         """
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
+        conn = getattr(self._tls, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=self.STATEMENT_CACHE_SIZE)
+            conn.row_factory = sqlite3.Row
+            self._configure_connection(conn)
+            self._tls.conn = conn
+        
         try:
             yield conn
             conn.commit()
@@ -41,15 +167,66 @@ class Database:
             conn.rollback()
             self.logger.error(f"Database error: {e}")
             raise e
-        finally:
+    
+    def close_thread_connection(self):
+        """
+        Close the calling thread's pooled connection, if any
+        
+        Connections of other threads are closed when those threads exit.
+        """
+        conn = getattr(self._tls, 'conn', None)
+        if conn is not None:
+            self._tls.conn = None
             conn.close()
     
+    def _configure_connection(self, conn: sqlite3.Connection):
+        """
+        Apply WAL journaling and performance PRAGMAs to a connection
+        
+        Args:
+            conn: Newly opened database connection
+        """
+        if not self._wal_enabled:
+            # auto_vacuum only takes effect if set before the database file
+            # is initialized, which switching to WAL does; existing databases
+            # are converted by vacuum(full=True)
+            conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+            mode = conn.execute('PRAGMA journal_mode=WAL').fetchone()[0]
+            self._wal_enabled = True
+            if mode.lower() != 'wal':
+                self.logger.warning(f"WAL journal mode unavailable, using {mode}")
+        
+        for pragma in self.CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+    
+    @staticmethod
+    def _fetch_dicts(conn: sqlite3.Connection, sql: str, params: tuple) -> List[Dict[str, Any]]:
+        """
+        Run a query and return its rows as dictionaries
+        
+        Rows are fetched as plain tuples and zipped with column names looked
+        up once per query, instead of materializing a sqlite3.Row per row.
+        
+        Args:
+            conn: Database connection
+            sql: Query to run
+            params: Query parameters
+            
+        Returns:
+            List of row dictionaries
+        """
+        cursor = conn.cursor()
+        cursor.row_factory = None
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+    
     def _initialize_schema(self):
         """Create database tables if they don't exist"""
         schema = '''
         CREATE TABLE IF NOT EXISTS light_readings (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            timestamp INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),
             raw_value INTEGER NOT NULL,
             calibrated_value REAL,
             sensor_id TEXT DEFAULT 'main'
@@ -57,7 +234,7 @@ class Database:
         
         CREATE TABLE IF NOT EXISTS curtain_operations (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            timestamp INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),
             operation TEXT NOT NULL,
             trigger TEXT,
             light_level_before INTEGER,
@@ -76,7 +253,7 @@ class Database:
         
         CREATE TABLE IF NOT EXISTS error_log (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            timestamp INTEGER NOT NULL DEFAULT (strftime('%s', 'now')),
             error_type TEXT NOT NULL,
             error_message TEXT NOT NULL,
             component TEXT NOT NULL,
@@ -85,30 +262,85 @@ class Database:
         
         CREATE INDEX IF NOT EXISTS idx_light_timestamp ON light_readings(timestamp);
         CREATE INDEX IF NOT EXISTS idx_operations_timestamp ON curtain_operations(timestamp);
+        CREATE INDEX IF NOT EXISTS idx_errors_timestamp ON error_log(timestamp);
         '''
         
         try:
             with self.get_connection() as conn:
                 conn.executescript(schema)
+                self._migrate_schema(conn)
             self.logger.info(f"Database initialized at {self.db_path}")
         except Exception as e:
             self.logger.error(f"Failed to initialize database schema: {e}")
             raise
     
+    def _migrate_schema(self, conn: sqlite3.Connection):
+        """
+        Upgrade databases created by older versions
+        
+        Version 0 stored timestamps as CURRENT_TIMESTAMP text; those are
+        converted in place to unix seconds. All inserts supply the timestamp
+        explicitly, so the old column defaults are never relied on.
+        
+        Args:
+            conn: Database connection
+        """
+        version = conn.execute('PRAGMA user_version').fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+        
+        for table in _TIMESTAMPED_TABLES:
+            cursor = conn.execute(
+                f'''UPDATE {table} 
+                    SET timestamp = CAST(strftime('%s', timestamp) AS INTEGER) 
+                    WHERE typeof(timestamp) = 'text' '''
+            )
+            if cursor.rowcount > 0:
+                self.logger.info(f"Migrated {cursor.rowcount} {table} timestamps to unix seconds")
+        
+        conn.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+    
     # Light Readings Operations
     
     def insert_light_reading(self, raw_value: int, calibrated_value: Optional[float] = None, 
                             sensor_id: str = 'main'):
-        """Insert a light sensor reading"""
+        """Queue a light sensor reading for the next batched insert"""
+        # Capture the time now since the row is only written on the next flush
+        timestamp = int(time.time())
+        
+        self._pending.append((timestamp, raw_value, calibrated_value, sensor_id))
+        
+        if len(self._pending) >= self.LIGHT_BATCH_SIZE:
+            self._flush_event.set()
+    
+    def flush(self):
+        """Write all pending light readings in a single transaction"""
+        rows = []
+        try:
+            while True:
+                rows.append(self._pending.popleft())
+        except IndexError:
+            pass
+        
+        if not rows:
+            return
+        
         try:
             with self.get_connection() as conn:
-                conn.execute(
-                    'INSERT INTO light_readings (raw_value, calibrated_value, sensor_id) VALUES (?, ?, ?)',
-                    (raw_value, calibrated_value, sensor_id)
+                conn.executemany(
+                    _SQL_INSERT_LIGHT_READINGS,
+                    rows
                 )
-            self.logger.debug(f"Inserted light reading: {raw_value}")
+            self.logger.debug(f"Inserted {len(rows)} light readings")
         except Exception as e:
-            self.logger.error(f"Failed to insert light reading: {e}")
+            self.logger.error(f"Failed to insert {len(rows)} light readings: {e}")
+    
+    def _writer_loop(self):
+        """Background thread loop flushing buffered light readings"""
+        while True:
+            self._flush_event.wait(timeout=self.LIGHT_FLUSH_INTERVAL)
+            self._flush_event.clear()
+            self.flush()
     
     def get_recent_light_readings(self, hours: int = 24, limit: int = 1000) -> List[Dict[str, Any]]:
         """
@@ -121,34 +353,51 @@ class Database:
         Returns:
             List of light reading dictionaries
         """
-        cutoff = datetime.now() - timedelta(hours=hours)
+        cutoff = int(time.time()) - hours * 3600
         try:
             with self.get_connection() as conn:
-                cursor = conn.execute(
-                    '''SELECT * FROM light_readings 
-                       WHERE timestamp > ? 
-                       ORDER BY timestamp DESC 
-                       LIMIT ?''',
-                    (cutoff, limit)
-                )
-                return [dict(row) for row in cursor.fetchall()]
+                return self._fetch_dicts(conn, _SQL_RECENT_LIGHT_READINGS, (cutoff, limit))
         except Exception as e:
             self.logger.error(f"Failed to get light readings: {e}")
             return []
     
+    def iter_recent_light_readings(self, hours: int = 24,
+                                   limit: int = 1000) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Stream recent light readings in batches
+        
+        Same rows as get_recent_light_readings, but only READ_BATCH_SIZE rows
+        are held in memory at a time. Must be consumed on a single thread.
+        
+        Args:
+            hours: Number of hours to look back
+            limit: Maximum number of readings to return
+            
+        Yields:
+            Lists of light reading dictionaries, newest first
+        """
+        cutoff = int(time.time()) - hours * 3600
+        try:
+            with self.get_connection() as conn:
+                cursor = conn.cursor()
+                cursor.row_factory = None
+                cursor.execute(_SQL_RECENT_LIGHT_READINGS, (cutoff, limit))
+                columns = [column[0] for column in cursor.description]
+                
+                rows = cursor.fetchmany(self.READ_BATCH_SIZE)
+                while rows:
+                    yield [dict(zip(columns, row)) for row in rows]
+                    rows = cursor.fetchmany(self.READ_BATCH_SIZE)
+        except Exception as e:
+            self.logger.error(f"Failed to stream light readings: {e}")
+    
     def get_light_statistics(self, hours: int = 24) -> Dict[str, Any]:
         """Get statistics for light readings"""
-        cutoff = datetime.now() - timedelta(hours=hours)
+        cutoff = int(time.time()) - hours * 3600
         try:
             with self.get_connection() as conn:
                 cursor = conn.execute(
-                    '''SELECT 
-                        COUNT(*) as count,
-                        AVG(raw_value) as average,
-                        MIN(raw_value) as minimum,
-                        MAX(raw_value) as maximum
-                       FROM light_readings 
-                       WHERE timestamp > ?''',
+                    _SQL_LIGHT_STATISTICS,
                     (cutoff,)
                 )
                 row = cursor.fetchone()
@@ -166,12 +415,9 @@ class Database:
         try:
             with self.get_connection() as conn:
                 conn.execute(
-                    '''INSERT INTO curtain_operations 
-                       (operation, trigger, light_level_before, light_level_after, 
-                        duration_ms, success, error_message) 
-                       VALUES (?, ?, ?, ?, ?, ?, ?)''',
-                    (operation, trigger, light_level_before, light_level_after, 
-                     duration_ms, success, error_message)
+                    _SQL_INSERT_OPERATION,
+                    (int(time.time()), operation, trigger, light_level_before,
+                     light_level_after, duration_ms, success, error_message)
                 )
             self.logger.info(f"Logged operation: {operation} ({trigger})")
         except Exception as e:
@@ -179,17 +425,10 @@ class Database:
     
     def get_recent_operations(self, hours: int = 24, limit: int = 100) -> List[Dict[str, Any]]:
         """Get recent curtain operations"""
-        cutoff = datetime.now() - timedelta(hours=hours)
+        cutoff = int(time.time()) - hours * 3600
         try:
             with self.get_connection() as conn:
-                cursor = conn.execute(
-                    '''SELECT * FROM curtain_operations 
-                       WHERE timestamp > ? 
-                       ORDER BY timestamp DESC 
-                       LIMIT ?''',
-                    (cutoff, limit)
-                )
-                return [dict(row) for row in cursor.fetchall()]
+                return self._fetch_dicts(conn, _SQL_RECENT_OPERATIONS, (cutoff, limit))
         except Exception as e:
             self.logger.error(f"Failed to get operations: {e}")
             return []
@@ -201,7 +440,7 @@ class Database:
         try:
             with self.get_connection() as conn:
                 cursor = conn.execute(
-                    'SELECT setting_value FROM system_config WHERE setting_key = ?',
+                    _SQL_GET_SETTING,
                     (key,)
                 )
                 row = cursor.fetchone()
@@ -215,9 +454,7 @@ class Database:
         try:
             with self.get_connection() as conn:
                 conn.execute(
-                    '''INSERT OR REPLACE INTO system_config 
-                       (setting_key, setting_value, data_type, updated_at) 
-                       VALUES (?, ?, ?, CURRENT_TIMESTAMP)''',
+                    _SQL_SET_SETTING,
                     (key, value, data_type)
                 )
             self.logger.debug(f"Set setting: {key} = {value}")
@@ -231,10 +468,8 @@ class Database:
         try:
             with self.get_connection() as conn:
                 conn.execute(
-                    '''INSERT INTO error_log 
-                       (error_type, error_message, component, severity) 
-                       VALUES (?, ?, ?, ?)''',
-                    (error_type, error_message, component, severity)
+                    _SQL_INSERT_ERROR,
+                    (int(time.time()), error_type, error_message, component, severity)
                 )
             self.logger.debug(f"Logged error: {error_type} in {component}")
         except Exception as e:
@@ -242,17 +477,10 @@ class Database:
     
     def get_recent_errors(self, hours: int = 24, limit: int = 100) -> List[Dict[str, Any]]:
         """Get recent system errors"""
-        cutoff = datetime.now() - timedelta(hours=hours)
+        cutoff = int(time.time()) - hours * 3600
         try:
             with self.get_connection() as conn:
-                cursor = conn.execute(
-                    '''SELECT * FROM error_log 
-                       WHERE timestamp > ? 
-                       ORDER BY timestamp DESC 
-                       LIMIT ?''',
-                    (cutoff, limit)
-                )
-                return [dict(row) for row in cursor.fetchall()]
+                return self._fetch_dicts(conn, _SQL_RECENT_ERRORS, (cutoff, limit))
         except Exception as e:
             self.logger.error(f"Failed to get errors: {e}")
             return []
@@ -261,41 +489,77 @@ class Database:
     
     def cleanup_old_data(self, retention_days: int = 30):
         """Remove data older than retention period"""
-        cutoff = datetime.now() - timedelta(days=retention_days)
+        cutoff = int(time.time()) - retention_days * 86400
         try:
+            light_deleted = self._delete_in_chunks(_SQL_DELETE_OLD_LIGHT_READINGS, cutoff)
+            ops_deleted = self._delete_in_chunks(_SQL_DELETE_OLD_OPERATIONS, cutoff)
+            errors_deleted = self._delete_in_chunks(_SQL_DELETE_OLD_ERRORS, cutoff)
+            
+            # Return the space used by the deleted pages' WAL frames
             with self.get_connection() as conn:
-                # Clean old light readings
-                cursor = conn.execute(
-                    'DELETE FROM light_readings WHERE timestamp < ?',
-                    (cutoff,)
-                )
-                light_deleted = cursor.rowcount
-                
-                # Clean old operations
-                cursor = conn.execute(
-                    'DELETE FROM curtain_operations WHERE timestamp < ?',
-                    (cutoff,)
-                )
-                ops_deleted = cursor.rowcount
-                
-                # Clean old errors
-                cursor = conn.execute(
-                    'DELETE FROM error_log WHERE timestamp < ?',
-                    (cutoff,)
-                )
-                errors_deleted = cursor.rowcount
+                conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
                 
             self.logger.info(f"Cleanup: deleted {light_deleted} readings, "
                            f"{ops_deleted} operations, {errors_deleted} errors")
         except Exception as e:
             self.logger.error(f"Failed to cleanup old data: {e}")
     
-    def vacuum(self):
-        """Optimize database by running VACUUM"""
+    def _delete_in_chunks(self, sql: str, cutoff: int) -> int:
+        """
+        Run a chunked DELETE until no more rows match
+        
+        Each chunk is its own short BEGIN IMMEDIATE transaction so buffered
+        light reading inserts can interleave with a long cleanup.
+        
+        Args:
+            sql: DELETE statement taking (cutoff, chunk size) parameters
+            cutoff: Unix timestamp before which rows are deleted
+            
+        Returns:
+            Total number of rows deleted
+        """
+        deleted = 0
+        while True:
+            with self.get_connection() as conn:
+                conn.execute('BEGIN IMMEDIATE')
+                cursor = conn.execute(sql, (cutoff, self.CLEANUP_CHUNK_SIZE))
+            deleted += cursor.rowcount
+            if cursor.rowcount < self.CLEANUP_CHUNK_SIZE:
+                return deleted
+    
+    def vacuum(self, full: bool = False):
+        """
+        Reclaim free pages without blocking writers
+        
+        Databases created before auto_vacuum=INCREMENTAL was enabled need one
+        full VACUUM to switch modes; until then only full=True frees space.
+        
+        Args:
+            full: Rewrite the whole database with VACUUM, converting it to
+                incremental auto-vacuum. Takes an exclusive lock.
+        """
         try:
-            conn = sqlite3.connect(self.db_path)
-            conn.execute('VACUUM')
-            conn.close()
-            self.logger.info("Database vacuumed successfully")
+            # A dedicated connection, since pooled ones cache the auto_vacuum
+            # mode they were opened with
+            conn = sqlite3.connect(self.db_path, isolation_level=None)
+            try:
+                if full:
+                    conn.execute('PRAGMA auto_vacuum=INCREMENTAL')
+                    conn.execute('VACUUM')
+                    self.logger.info("Database vacuumed successfully")
+                elif conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+                    self.logger.warning("Incremental vacuum unavailable, "
+                                        "run vacuum(full=True) once to enable it")
+                else:
+                    # executescript steps the pragma to completion, execute()
+                    # would free a single page; the checkpoint moves the freed
+                    # pages out of the WAL so the file actually shrinks
+                    conn.executescript(f'''
+                        PRAGMA incremental_vacuum({self.VACUUM_PAGES});
+                        PRAGMA wal_checkpoint(TRUNCATE);
+                    ''')
+                    self.logger.info("Database incrementally vacuumed")
+            finally:
+                conn.close()
         except Exception as e:
-            self.logger.error(f"Failed to vacuum database: {e}") 
\ No newline at end of file
+            self.logger.error(f"Failed to vacuum database: {e}")
@@ -3,18 +3,23 @@ Main Application Module
 Integrates all components and starts the curtain control system
 """
 
+import atexit
+import collections
+import functools
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener, RotatingFileHandler
+import queue
 import sys
 import os
 import threading
 import time
-from datetime import datetime
+from typing import Optional
 
 # Add parent directory to path to import server modules
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
 
-from flask import Flask, jsonify, request
+import orjson
+from flask import Flask, Response, g, jsonify, render_template, request, stream_with_context
 from flask_cors import CORS
 
 from config import get_config_manager
@@ -26,29 +31,45 @@ from database import Database
 # Initialize Flask app
 app = Flask(__name__)
 
-# Global components
+# Module-level loggers, looked up once instead of on every call
+log = logging.getLogger('curtain.server')
+publish_log = logging.getLogger('curtain.server.mqtt_publisher')
+auto_log = logging.getLogger('curtain.server.auto_mode')
+
+# Global configuration; runtime components live in the AppContext
 config_manager = None
 config = None
-serial_mgr = None
-mqtt_client = None
-db = None
-system_status = None
-latest_light_value = 0
+log_listener = None
+
+# Notified on every light reading so auto mode reacts without polling
+light_cv = threading.Condition()
+
+# Light readings since the last MQTT publish, as (timestamp, value) pairs
+light_ring = collections.deque(maxlen=256)
+
+# Queues of connected Server-Sent Events clients waiting for light updates
+light_subscribers = set()
+light_subscribers_lock = threading.Lock()
 
 
 def setup_logging():
     """Configure logging system"""
-    global config
+    global config, log_listener
     
     log_config = config.get('logging', {})
     level_name = log_config.get('level', 'INFO')
     level = getattr(logging, level_name, logging.INFO)
     format_str = log_config.get('format', '%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    formatter = logging.Formatter(format_str)
     
-    # Basic config
-    logging.basicConfig(level=level, format=format_str)
+    # Console handler
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(formatter)
+    handlers = [console_handler]
     
     # File handler
+    file_error = None
+    log_file = None
     if 'file' in log_config:
         try:
             log_file = log_config['file']
@@ -59,32 +80,69 @@ def setup_logging():
                 maxBytes=log_config.get('max_bytes', 10485760),
                 backupCount=log_config.get('backup_count', 5)
             )
-            handler.setFormatter(logging.Formatter(format_str))
-            logging.getLogger().addHandler(handler)
+            handler.setFormatter(formatter)
             
-            logging.info(f"Logging to file: {log_file}")
+            # Coalesce records into batched writes; errors flush immediately
+            handlers.append(MemoryHandler(
+                capacity=log_config.get('buffer_capacity', 256),
+                flushLevel=logging.ERROR,
+                target=handler,
+                flushOnClose=True
+            ))
         except Exception as e:
-            logging.error(f"Failed to setup file logging: {e}")
+            file_error = e
+    
+    # The root logger only enqueues records; a single listener thread does
+    # the console/file writes and rotation, so serial and MQTT callbacks
+    # never block on disk I/O
+    log_queue = queue.SimpleQueue()
+    root_logger = logging.getLogger()
+    root_logger.setLevel(level)
+    root_logger.handlers = [QueueHandler(log_queue)]
+    
+    log_listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+    
+    if file_error is not None:
+        log.error("Failed to setup file logging: %s", file_error)
+    elif log_file:
+        log.info("Logging to file: %s", log_file)
 
 
-def setup_components():
-    """Initialize all system components"""
-    global serial_mgr, mqtt_client, db, system_status, config
+def setup_components() -> AppContext:
+    """
+    Initialize all system components
+    
+    Returns:
+        Context holding the components, also stored in app.config['ctx']
+    """
+    global config
     
-    logger = logging.getLogger(__name__)
-    logger.info("Initializing system components...")
+    log.info("Initializing system components...")
     
     # Initialize system status
-    system_status = SystemStatus()
+    ctx = AppContext(config=config, system_status=SystemStatus())
+    app.config['ctx'] = ctx
+    system_status = ctx.system_status
     
     # Setup database
     try:
         db_path = config['database']['path']
-        db = Database(db_path)
-        logger.info(f"Database initialized: {db_path}")
+        ctx.db = Database(db_path)
+        log.info("Database initialized: %s", db_path)
     except Exception as e:
-        logger.error(f"Database initialization failed: {e}")
-        db = None
+        log.error("Database initialization failed: %s", e)
+        ctx.db = None
+    
+    # Optional realtime scheduling for the serial reader and MQTT flusher
+    system_config = config.get('system', {})
+    realtime = None
+    if system_config.get('realtime', False):
+        realtime = {
+            'priority': system_config.get('realtime_priority', 20),
+            'cpu': system_config.get('realtime_cpu')
+        }
     
     # Setup serial communication
     try:
@@ -92,33 +150,37 @@ def setup_components():
         serial_mgr = SerialManager(
             port=serial_config['port'],
             baudrate=serial_config['baudrate'],
-            timeout=serial_config['timeout']
+            timeout=serial_config['timeout'],
+            realtime=realtime
         )
+        ctx.serial_mgr = serial_mgr
         
         # Register callbacks
-        serial_mgr.register_callback('LIGHT', on_light_reading)
-        serial_mgr.register_callback('POSITION', on_position_update)
-        serial_mgr.register_callback('MOTOR', on_motor_status)
-        serial_mgr.register_callback('MODE', on_mode_update)
-        serial_mgr.register_callback('ERROR', on_arduino_error)
+        serial_mgr.register_callback('LIGHT', functools.partial(on_light_reading, ctx))
+        serial_mgr.register_callback('POSITION', functools.partial(on_position_update, ctx))
+        serial_mgr.register_callback('MOTOR', functools.partial(on_motor_status, ctx))
+        serial_mgr.register_callback('MODE', functools.partial(on_mode_update, ctx))
+        serial_mgr.register_callback('ERROR', functools.partial(on_arduino_error, ctx))
         
         # Attempt connection
         if serial_mgr.connect():
             system_status.arduino = serial_mgr.get_arduino_status()
-            logger.info("Arduino connected successfully")
+            log.info("Arduino connected successfully")
+            
+            # The Arduino reports its mode once booted; wait for that rather
+            # than a fixed delay before syncing it to the server default
+            if not serial_mgr.wait_until_ready():
+                log.warning("Arduino did not report its mode, initializing anyway")
             
-            # Initialize Arduino to manual mode to sync with server default
-            # Wait longer to ensure Arduino has fully booted and processed initial messages
-            time.sleep(1.5)  # Increased delay for Arduino initialization
             serial_mgr.send_command("MANUAL_MODE")
-            time.sleep(0.3)  # Wait for response
-            logger.info("Initialized Arduino to MANUAL mode")
+            serial_mgr.get_status()
+            log.info("Initialized Arduino to MANUAL mode")
         else:
-            logger.warning("Arduino connection failed - running without hardware")
+            log.warning("Arduino connection failed - running without hardware")
             
     except Exception as e:
-        logger.error(f"Serial manager initialization failed: {e}")
-        serial_mgr = None
+        log.error("Serial manager initialization failed: %s", e)
+        ctx.serial_mgr = None
     
     # Setup MQTT client
     try:
@@ -129,266 +191,440 @@ def setup_components():
             client_id=mqtt_config['client_id'],
             topics=mqtt_config['topics'],
             username=mqtt_config.get('username'),
-            password=mqtt_config.get('password')
+            password=mqtt_config.get('password'),
+            realtime=realtime
         )
+        ctx.mqtt_client = mqtt_client
         
         if mqtt_client.connect():
-            mqtt_client.subscribe_control_commands(on_mqtt_command)
+            mqtt_client.subscribe_control_commands(functools.partial(on_mqtt_command, ctx))
             system_status.mqtt = mqtt_client.get_status()
-            logger.info("MQTT connected successfully")
+            log.info("MQTT client started")
         else:
-            logger.warning("MQTT connection failed")
+            log.warning("MQTT client failed to start")
             
     except Exception as e:
-        logger.error(f"MQTT client initialization failed: {e}")
-        mqtt_client = None
+        log.error("MQTT client initialization failed: %s", e)
+        ctx.mqtt_client = None
     
-    # Start background threads
-    threading.Thread(target=mqtt_publish_loop, daemon=True, name="MQTT-Publisher").start()
-    threading.Thread(target=auto_mode_loop, daemon=True, name="Auto-Mode").start()
-    threading.Thread(target=heartbeat_loop, daemon=True, name="Heartbeat").start()
+    # Start background thread
+    threading.Thread(target=scheduler_loop, args=(ctx,), daemon=True, name="Scheduler").start()
     
-    logger.info("All components initialized")
+    log.info("All components initialized")
+    return ctx
 
 
 # Callback handlers
+#
+# Serial and MQTT callbacks are registered with the context bound as their
+# first argument, so the hot paths read components from a local
 
-def on_light_reading(value: int):
+def on_light_reading(ctx: AppContext, value: int):
     """Handle light sensor reading from Arduino"""
-    global latest_light_value, system_status, db
+    previous_value = ctx.latest_light_value
+    ctx.latest_light_value = value
+    timestamp = now_iso()
+    light_ring.append((timestamp, value))
     
-    latest_light_value = value
+    with light_cv:
+        light_cv.notify_all()
     
     # Update system status
-    if system_status:
-        system_status.latest_light = LightReading(
-            timestamp=datetime.now(),
-            raw_value=value
-        )
+    ctx.system_status.latest_light = LightReading(raw_value=value)
+    
+    # Push changed values to web clients
+    if value != previous_value:
+        notify_light_subscribers(value, timestamp)
     
     # Save to database
+    db = ctx.db
     if db:
         try:
             db.insert_light_reading(value)
         except Exception as e:
-            logging.error(f"Failed to save light reading: {e}")
+            log.error("Failed to save light reading: %s", e)
 
 
-def on_position_update(position: str):
-    """Handle curtain position update"""
-    global system_status, mqtt_client
+# Server-Sent Events frame for a light reading, built like the current
+# reading response instead of encoding a dict per event
+_LIGHT_EVENT_TEMPLATE = b'data: {"value":%d,"timestamp":"%s"}\n\n'
+
+
+def notify_light_subscribers(value: int, timestamp: str):
+    """Queue a light reading event for every connected SSE client"""
+    with light_subscribers_lock:
+        if not light_subscribers:
+            return
+        subscribers = list(light_subscribers)
     
+    event = _LIGHT_EVENT_TEMPLATE % (value, timestamp.encode())
+    for subscriber in subscribers:
+        try:
+            subscriber.put_nowait(event)
+        except queue.Full:
+            pass  # Slow client, it will catch up with the next change
+
+
+def on_position_update(ctx: AppContext, position: str):
+    """Handle curtain position update"""
     try:
-        if system_status:
-            system_status.curtain.position = CurtainPosition(position)
+        ctx.system_status.curtain.position = CURTAIN_POSITIONS.get(position, CurtainPosition.UNKNOWN)
             
         # Publish to MQTT
+        mqtt_client = ctx.mqtt_client
         if mqtt_client and mqtt_client.is_connected():
             mqtt_client.publish_position_status(position)
             
-        logging.info(f"Curtain position updated: {position}")
+        if log.isEnabledFor(logging.INFO):
+            log.info("Curtain position updated: %s", position)
     except Exception as e:
-        logging.error(f"Error handling position update: {e}")
+        log.error("Error handling position update: %s", e)
 
 
-def on_motor_status(status: str):
+def on_motor_status(ctx: AppContext, status: str):
     """Handle motor status update"""
-    global system_status
-    
     try:
-        if system_status:
-            system_status.curtain.motor_state = MotorState(status)
-        logging.info(f"Motor status updated: {status}")
+        motor_state = MOTOR_STATES.get(status)
+        if motor_state is None:
+            log.warning("Unknown motor status: %s", status)
+            return
+        
+        ctx.system_status.curtain.motor_state = motor_state
+        if log.isEnabledFor(logging.INFO):
+            log.info("Motor status updated: %s", status)
     except Exception as e:
-        logging.error(f"Error handling motor status: {e}")
+        log.error("Error handling motor status: %s", e)
+
+
+_MODE_AUTO = SystemMode.AUTO.value
+_MODE_MANUAL = SystemMode.MANUAL.value
 
 
-def on_mode_update(mode: str):
+def on_mode_update(ctx: AppContext, mode: str):
     """Handle mode update from Arduino"""
-    global system_status
-    
     try:
         mode_lower = mode.lower()
-        logging.info(f"Received MODE update from Arduino: '{mode_lower}'")
+        if log.isEnabledFor(logging.INFO):
+            log.info("Received MODE update from Arduino: '%s'", mode_lower)
         
-        if system_status:
-            # Update both the settings and curtain mode
-            system_status.settings.auto_mode_enabled = (mode_lower == 'auto')
-            system_status.curtain.mode = SystemMode(mode_lower)
-            logging.info(f"✓ System status updated: mode={mode_lower}, auto_enabled={system_status.settings.auto_mode_enabled}")
-        else:
-            logging.warning("System status not initialized, cannot update mode")
+        # The Arduino only reports two modes, so compare strings directly
+        is_auto = mode_lower == _MODE_AUTO
+        if not is_auto and mode_lower != _MODE_MANUAL:
+            log.warning("Unknown mode from Arduino: '%s'", mode_lower)
+            return
+        
+        # Update both the settings and curtain mode
+        system_status = ctx.system_status
+        system_status.settings.auto_mode_enabled = is_auto
+        system_status.curtain.mode = SystemMode.AUTO if is_auto else SystemMode.MANUAL
+        if log.isEnabledFor(logging.INFO):
+            log.info("✓ System status updated: mode=%s, auto_enabled=%s",
+                     mode_lower, system_status.settings.auto_mode_enabled)
             
     except Exception as e:
-        logging.error(f"Error handling mode update: {e}", exc_info=True)
+        log.error("Error handling mode update: %s", e, exc_info=True)
 
 
-def on_arduino_error(error_msg: str):
+def on_arduino_error(ctx: AppContext, error_msg: str):
     """Handle error from Arduino"""
-    logging.error(f"Arduino error: {error_msg}")
+    log.error("Arduino error: %s", error_msg)
     
+    db = ctx.db
     if db:
         try:
             db.log_error('arduino_error', error_msg, 'arduino')
         except Exception as e:
-            logging.error(f"Failed to log Arduino error: {e}")
+            log.error("Failed to log Arduino error: %s", e)
     
+    mqtt_client = ctx.mqtt_client
     if mqtt_client and mqtt_client.is_connected():
         mqtt_client.publish_error(error_msg, 'arduino')
 
 
-def on_mqtt_command(payload: dict):
+def on_mqtt_command(ctx: AppContext, payload: dict):
     """Handle MQTT control command"""
-    global serial_mgr, db, latest_light_value
-    
     command = payload.get('command', '').lower()
-    logging.info(f"Received MQTT command: {command}")
+    log.info("Received MQTT command: %s", command)
     
+    serial_mgr = ctx.serial_mgr
     if not serial_mgr or not serial_mgr.is_connected():
-        logging.warning("Cannot execute command: Arduino not connected")
+        log.warning("Cannot execute command: Arduino not connected")
         return
     
+    db = ctx.db
     try:
         if command == 'open':
             serial_mgr.open_curtain()
             if db:
-                db.log_operation('open', 'mqtt', latest_light_value)
+                db.log_operation('open', 'mqtt', ctx.latest_light_value)
         elif command == 'close':
             serial_mgr.close_curtain()
             if db:
-                db.log_operation('close', 'mqtt', latest_light_value)
+                db.log_operation('close', 'mqtt', ctx.latest_light_value)
         elif command == 'stop':
             serial_mgr.stop_motor()
         elif command == 'calibrate':
             serial_mgr.calibrate_light()
         else:
-            logging.warning(f"Unknown MQTT command: {command}")
+            log.warning("Unknown MQTT command: %s", command)
+    except Exception as e:
+        log.error("Error executing MQTT command: %s", e)
+
+
+# Background tasks
+#
+# Light publishing, heartbeats and auto mode checks all run on the single
+# scheduler thread, which sleeps until the earliest deadline or, once auto
+# mode may act again, until the next light reading arrives
+
+# Minimum time between automatic curtain actions
+AUTO_MIN_INTERVAL_NS = 60 * 1_000_000_000
+
+
+def publish_light_readings(mqtt_client: Optional[MQTTClient]):
+    """Publish the light readings collected since the last call"""
+    try:
+        # Drain with popleft so readings arriving meanwhile are kept
+        batch = []
+        next_reading = light_ring.popleft
+        try:
+            while True:
+                batch.append(next_reading())
+        except IndexError:
+            pass
+        
+        if batch and mqtt_client and mqtt_client.is_connected():
+            mqtt_client.publish_light_batch(batch)
     except Exception as e:
-        logging.error(f"Error executing MQTT command: {e}")
+        publish_log.error("MQTT publish error: %s", e)
+
 
+def publish_heartbeat(mqtt_client: Optional[MQTTClient]):
+    """Send a heartbeat message"""
+    try:
+        if mqtt_client and mqtt_client.is_connected():
+            mqtt_client.publish_heartbeat()
+    except Exception as e:
+        log.error("Heartbeat error: %s", e)
 
-# Background loops
 
-def mqtt_publish_loop():
-    """Background thread to publish data to MQTT"""
-    global mqtt_client, latest_light_value, config
+def check_auto_mode(ctx: AppContext) -> bool:
+    """
+    Log the curtain action auto mode takes for the latest light reading
     
-    logger = logging.getLogger('mqtt_publisher')
-    interval = config['mqtt']['publish_interval']['light']
+    Returns:
+        True if an action was taken, False otherwise
+    """
+    try:
+        system_status = ctx.system_status
+        if not system_status.settings.auto_mode_enabled:
+            return False
+        
+        serial_mgr = ctx.serial_mgr
+        if not serial_mgr or not serial_mgr.is_connected():
+            return False
+        
+        # set_thresholds updates this dictionary through the config manager,
+        # which shares it whether loaded from file or defaults
+        thresholds = ctx.config['curtain']['thresholds']
+        open_threshold = thresholds['dark']
+        close_threshold = thresholds['bright']
+        
+        light_value = ctx.latest_light_value
+        current_position = system_status.curtain.position
+        db = ctx.db
+        
+        # In auto mode, Arduino handles the continuous motor control
+        # Server just logs the activity
+        if light_value < open_threshold:
+            if current_position is not CurtainPosition.OPEN:
+                auto_log.info("Auto mode: Curtain opening (light: %s)", light_value)
+                if db:
+                    db.log_operation('auto_opening', 'auto_dark', light_value)
+                return True
+        
+        elif light_value > close_threshold:
+            if current_position is not CurtainPosition.CLOSED:
+                auto_log.info("Auto mode: Curtain closing (light: %s)", light_value)
+                if db:
+                    db.log_operation('auto_closing', 'auto_bright', light_value)
+                return True
+                
+    except Exception as e:
+        auto_log.error("Auto mode error: %s", e)
     
-    while True:
-        try:
-            time.sleep(interval)
-            
-            if mqtt_client and mqtt_client.is_connected() and latest_light_value > 0:
-                mqtt_client.publish_light_reading({
-                    'value': latest_light_value,
-                    'timestamp': datetime.now().isoformat()
-                })
-        except Exception as e:
-            logger.error(f"MQTT publish error: {e}")
+    return False
 
 
-def auto_mode_loop():
-    """Background thread for automatic curtain control"""
-    global system_status, serial_mgr, config, db, latest_light_value
+def scheduler_loop(ctx: AppContext):
+    """Background thread running all periodic tasks"""
+    publish_intervals = ctx.config['mqtt']['publish_interval']
+    light_interval_ns = int(publish_intervals['light'] * 1_000_000_000)
+    heartbeat_interval_ns = int(publish_intervals['heartbeat'] * 1_000_000_000)
+    mqtt_client = ctx.mqtt_client
+    
+    # Bound once so the loop body only touches locals
+    reading_cv = light_cv
+    monotonic_ns = time.monotonic_ns
     
-    logger = logging.getLogger('auto_mode')
-    last_action_time = 0
-    min_interval = 60  # Minimum 60 seconds between actions
+    # Deadlines on the monotonic clock, so slow tasks and wall-clock
+    # adjustments do not shift the schedule; missed ticks are skipped
+    now = monotonic_ns()
+    next_light_ns = now + light_interval_ns
+    next_heartbeat_ns = now + heartbeat_interval_ns
+    next_auto_ns = now
     
     while True:
         try:
-            time.sleep(5)
-            
-            if not system_status or not system_status.settings.auto_mode_enabled:
-                continue
+            now = monotonic_ns()
+            wake_ns = min(next_light_ns, next_heartbeat_ns)
             
-            if not serial_mgr or not serial_mgr.is_connected():
-                continue
-            
-            # Check if enough time has passed since last action
-            if time.time() - last_action_time < min_interval:
-                continue
+            if now >= next_auto_ns:
+                # Auto mode may act, so also wake on the next light reading
+                with reading_cv:
+                    reading_cv.wait(timeout=max(0, wake_ns - now) / 1_000_000_000)
+            else:
+                wake_ns = min(wake_ns, next_auto_ns)
+                if wake_ns > now:
+                    time.sleep((wake_ns - now) / 1_000_000_000)
             
-            thresholds = config['curtain']['thresholds']
-            open_threshold = thresholds['dark']
-            close_threshold = thresholds['bright']
+            now = monotonic_ns()
             
-            current_position = system_status.curtain.position
+            if now >= next_light_ns:
+                publish_light_readings(mqtt_client)
+                next_light_ns = max(next_light_ns + light_interval_ns, now)
             
-            # In auto mode, Arduino handles the continuous motor control
-            # Server just logs the activity
-            if latest_light_value < open_threshold:
-                if current_position != CurtainPosition.OPEN:
-                    logger.info(f"Auto mode: Curtain opening (light: {latest_light_value})")
-                    if db:
-                        db.log_operation('auto_opening', 'auto_dark', latest_light_value)
-                    last_action_time = time.time()
+            if now >= next_heartbeat_ns:
+                publish_heartbeat(mqtt_client)
+                next_heartbeat_ns = max(next_heartbeat_ns + heartbeat_interval_ns, now)
             
-            elif latest_light_value > close_threshold:
-                if current_position != CurtainPosition.CLOSED:
-                    logger.info(f"Auto mode: Curtain closing (light: {latest_light_value})")
-                    if db:
-                        db.log_operation('auto_closing', 'auto_bright', latest_light_value)
-                    last_action_time = time.time()
-                    
+            if now >= next_auto_ns and check_auto_mode(ctx):
+                next_auto_ns = monotonic_ns() + AUTO_MIN_INTERVAL_NS
+                
         except Exception as e:
-            logger.error(f"Auto mode error: {e}")
+            log.error("Scheduler error: %s", e)
 
 
-def heartbeat_loop():
-    """Background thread to send heartbeat messages"""
-    global mqtt_client, config
-    
-    interval = config['mqtt']['publish_interval']['heartbeat']
-    
-    while True:
-        try:
-            time.sleep(interval)
-            
-            if mqtt_client and mqtt_client.is_connected():
-                mqtt_client.publish_heartbeat()
-        except Exception as e:
-            logging.error(f"Heartbeat error: {e}")
+# REST API Endpoints
 
+@app.before_request
+def bind_context():
+    """Expose the application context to the request as g.ctx"""
+    g.ctx = app.config['ctx']
+
+
+def json_response(body: bytes, status: int = 200) -> Response:
+    """Wrap pre-serialized JSON bytes in a response"""
+    return Response(body, status=status, mimetype='application/json')
+
+
+def request_body() -> dict:
+    """Decode the JSON request body, an empty dict when there is none"""
+    return orjson.loads(request.get_data(cache=False) or b'{}')
+
+
+@app.errorhandler(orjson.JSONDecodeError)
+def invalid_json(error):
+    """Reject request bodies that are not valid JSON"""
+    return jsonify({'error': 'Invalid JSON body'}), 400
+
+
+# The web interface template has no variables, so it is rendered only once
+_index_html = None
 
-# REST API Endpoints
 
 @app.route('/')
 def index():
     """Serve the web interface"""
-    from flask import render_template
-    return render_template('index.html')
+    global _index_html
+    
+    if _index_html is None:
+        _index_html = render_template('index.html')
+    
+    response = Response(_index_html, mimetype='text/html')
+    response.headers['Cache-Control'] = 'max-age=3600'
+    return response
+
+
+# The current reading response has a fixed shape, so only the two scalars
+# are substituted instead of building and encoding a dict per request
+_CURRENT_LIGHT_TEMPLATE = b'{"value":%d,"timestamp":"%s","unit":"analog (0-1023)"}'
 
 
 @app.route('/api/v1/light/current')
 def get_current_light():
     """Get current light reading"""
-    return jsonify({
-        'value': latest_light_value,
-        'timestamp': datetime.now().isoformat(),
-        'unit': 'analog (0-1023)'
-    })
+    return json_response(_CURRENT_LIGHT_TEMPLATE % (g.ctx.latest_light_value, now_iso().encode()))
+
+
+@app.route('/api/v1/light/events')
+def light_events():
+    """Stream light readings to the client as Server-Sent Events"""
+    # Every open stream holds a server worker thread, so refuse streams past
+    # the limit; the dashboard then falls back to polling
+    max_streams = g.ctx.config['server'].get('max_event_streams', 4)
+    subscriber = queue.Queue(maxsize=16)
+    
+    with light_subscribers_lock:
+        if len(light_subscribers) >= max_streams:
+            response = jsonify({'error': 'Too many live update streams, poll /api/v1/light/current instead'})
+            response.status_code = 503
+            response.headers['Retry-After'] = '30'
+            return response
+        light_subscribers.add(subscriber)
+    
+    initial = _LIGHT_EVENT_TEMPLATE % (g.ctx.latest_light_value, now_iso().encode())
+    
+    def stream():
+        try:
+            yield initial
+            while True:
+                try:
+                    yield subscriber.get(timeout=15)
+                except queue.Empty:
+                    yield b": keepalive\n\n"  # Lets dead connections be detected
+        finally:
+            with light_subscribers_lock:
+                light_subscribers.discard(subscriber)
+    
+    response = Response(stream_with_context(stream()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 
 @app.route('/api/v1/light/history')
 def get_light_history():
     """Get historical light readings"""
     hours = request.args.get('hours', default=24, type=int)
+    db = g.ctx.db
     
-    if db:
-        readings = db.get_recent_light_readings(hours=hours)
-        return jsonify({'readings': readings, 'count': len(readings)})
-    else:
+    if not db:
         return jsonify({'error': 'Database not available'}), 503
+    
+    def stream():
+        # Same document as {'readings': [...], 'count': n}, written one
+        # database batch at a time instead of building the full list
+        count = 0
+        yield b'{"readings":['
+        for readings in db.iter_recent_light_readings(hours=hours):
+            if count:
+                yield b','
+            yield orjson.dumps(readings)[1:-1]
+            count += len(readings)
+        yield b'],"count":%d}' % count
+    
+    return Response(stream_with_context(stream()), mimetype='application/json')
 
 
 @app.route('/api/v1/curtain/control', methods=['POST'])
 def control_curtain():
     """Control curtain (open/close/stop)"""
-    data = request.json
+    data = request_body()
     action = data.get('action', '').lower()
+    ctx = g.ctx
+    serial_mgr = ctx.serial_mgr
+    db = ctx.db
     
     if not serial_mgr or not serial_mgr.is_connected():
         return jsonify({'error': 'Arduino not connected'}), 503
@@ -397,13 +633,13 @@ def control_curtain():
         if action == 'open':
             serial_mgr.open_curtain()
             if db:
-                db.log_operation('open', 'api', latest_light_value)
+                db.log_operation('open', 'api', ctx.latest_light_value)
             return jsonify({'status': 'success', 'action': 'open'})
         
         elif action == 'close':
             serial_mgr.close_curtain()
             if db:
-                db.log_operation('close', 'api', latest_light_value)
+                db.log_operation('close', 'api', ctx.latest_light_value)
             return jsonify({'status': 'success', 'action': 'close'})
         
         elif action == 'stop':
@@ -414,28 +650,26 @@ def control_curtain():
             return jsonify({'error': 'Invalid action'}), 400
             
     except Exception as e:
-        logging.error(f"Control error: {e}")
+        log.error("Control error: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/v1/curtain/status')
 def get_curtain_status():
     """Get curtain status"""
-    if system_status:
-        return jsonify(system_status.curtain.to_dict())
-    else:
-        return jsonify({'error': 'Status not available'}), 503
+    return json_response(g.ctx.system_status.curtain.to_json())
 
 
 @app.route('/api/v1/curtain/mode', methods=['POST'])
 def set_mode():
     """Set curtain mode (auto/manual)"""
-    data = request.json
+    data = request_body()
     mode = data.get('mode', '').lower()
     
     if mode not in ['auto', 'manual']:
         return jsonify({'error': 'Invalid mode'}), 400
     
+    serial_mgr = g.ctx.serial_mgr
     if not serial_mgr or not serial_mgr.is_connected():
         return jsonify({'error': 'Arduino not connected'}), 503
     
@@ -453,34 +687,32 @@ def set_mode():
         # when Arduino responds with MODE:AUTO or MODE:MANUAL
         
         # Verify the mode was set correctly by checking system status
-        if system_status:
-            actual_mode = system_status.curtain.mode.value
-            if actual_mode == mode:
-                logger.info(f"Mode successfully changed to {mode}")
-                return jsonify({'status': 'success', 'mode': mode})
-            else:
-                logger.warning(f"Mode change requested to {mode} but Arduino is in {actual_mode}")
-                return jsonify({'status': 'warning', 'requested': mode, 'actual': actual_mode})
-        
-        return jsonify({'status': 'success', 'mode': mode})
+        actual_mode = g.ctx.system_status.curtain.mode.value
+        if actual_mode == mode:
+            log.info("Mode successfully changed to %s", mode)
+            return jsonify({'status': 'success', 'mode': mode})
+        else:
+            log.warning("Mode change requested to %s but Arduino is in %s", mode, actual_mode)
+            return jsonify({'status': 'warning', 'requested': mode, 'actual': actual_mode})
         
     except Exception as e:
-        logging.error(f"Error setting mode: {e}")
+        log.error("Error setting mode: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
 @app.route('/api/v1/system/status')
 def get_system_status():
     """Get complete system status"""
-    if system_status:
-        return jsonify(system_status.to_dict())
-    else:
-        return jsonify({'error': 'Status not available'}), 503
+    ctx = g.ctx
+    if ctx.serial_mgr:
+        ctx.serial_mgr.get_arduino_status()  # Refreshes last_seen
+    return json_response(ctx.system_status.to_json())
 
 
 @app.route('/api/v1/system/calibrate', methods=['POST'])
 def calibrate():
     """Start light sensor calibration"""
+    serial_mgr = g.ctx.serial_mgr
     if not serial_mgr or not serial_mgr.is_connected():
         return jsonify({'error': 'Arduino not connected'}), 503
     
@@ -494,16 +726,23 @@ def calibrate():
 @app.route('/api/v1/curtain/thresholds', methods=['GET'])
 def get_thresholds():
     """Get current light thresholds"""
+    thresholds = g.ctx.config['curtain']['thresholds']
     return jsonify({
-        'dark_threshold': config['curtain']['thresholds']['dark'],
-        'bright_threshold': config['curtain']['thresholds']['bright']
+        'dark_threshold': thresholds['dark'],
+        'bright_threshold': thresholds['bright']
     })
 
 
 @app.route('/api/v1/curtain/thresholds', methods=['POST'])
 def set_thresholds():
     """Set light thresholds"""
-    data = request.json
+    data = request_body()
+    serial_mgr = g.ctx.serial_mgr
+    thresholds = g.ctx.config['curtain']['thresholds']
+    
+    # Updates go through the config manager so its dot-notation lookups
+    # stay in step with the configuration dictionary
+    manager = get_config_manager()
     
     try:
         arduino_connected = serial_mgr and serial_mgr.is_connected()
@@ -511,7 +750,7 @@ def set_thresholds():
         if 'dark_threshold' in data:
             dark_threshold = int(data['dark_threshold'])
             if 0 <= dark_threshold <= 1023:
-                config['curtain']['thresholds']['dark'] = dark_threshold
+                manager.set('curtain.thresholds.dark', dark_threshold)
                 # Send to Arduino if connected
                 if arduino_connected:
                     serial_mgr.send_command("SET_OPEN_THRESHOLD", str(dark_threshold))
@@ -519,15 +758,15 @@ def set_thresholds():
         if 'bright_threshold' in data:
             bright_threshold = int(data['bright_threshold'])
             if 0 <= bright_threshold <= 1023:
-                config['curtain']['thresholds']['bright'] = bright_threshold
+                manager.set('curtain.thresholds.bright', bright_threshold)
                 # Send to Arduino if connected
                 if arduino_connected:
                     serial_mgr.send_command("SET_CLOSE_THRESHOLD", str(bright_threshold))
         
         response_data = {
             'status': 'success',
-            'dark_threshold': config['curtain']['thresholds']['dark'],
-            'bright_threshold': config['curtain']['thresholds']['bright']
+            'dark_threshold': thresholds['dark'],
+            'bright_threshold': thresholds['bright']
         }
         
         if not arduino_connected:
@@ -543,6 +782,53 @@ def set_thresholds():
 
 # Main entry point
 
+# Worker threads kept free for REST requests on top of the SSE streams
+MIN_REST_THREADS = 4
+
+
+def run_server(host: str, port: int, debug: bool, threads: int = 12):
+    """
+    Serve the Flask app, using waitress unless running in debug mode
+    
+    Args:
+        host: Interface to bind to
+        port: Port to listen on
+        debug: Use the Flask development server with debugging enabled
+        threads: Number of waitress worker threads
+    """
+    
+    if not debug:
+        try:
+            from waitress import serve
+        except ImportError:
+            log.warning("waitress not installed, falling back to Flask development server")
+        else:
+            log.info("Serving with waitress")
+            serve(app, host=host, port=port, threads=threads)
+            return
+    
+    # The reloader would re-import this module in a child process and open
+    # the serial port a second time
+    app.run(host=host, port=port, debug=debug, threaded=True, use_reloader=False)
+
+
+def server_threads() -> int:
+    """
+    Get the number of web server worker threads to use
+    
+    Returns:
+        The configured thread count, raised if needed so REST requests still
+        get MIN_REST_THREADS workers with every allowed SSE stream open
+    """
+    threads = config['server'].get('threads', 12)
+    required = config['server'].get('max_event_streams', 4) + MIN_REST_THREADS
+    if threads < required:
+        log.warning("Raising server threads from %d to %d to leave room for REST requests",
+                    threads, required)
+        threads = required
+    return threads
+
+
 def main():
     """Main application entry point"""
     global config_manager, config
@@ -557,36 +843,46 @@ def main():
     
     # Setup logging
     setup_logging()
-    logger = logging.getLogger(__name__)
-    logger.info("Starting IoT Curtain Control System")
+    log.info("Starting IoT Curtain Control System")
+    
+    # Resolved before any threads start so a bad value cannot leave them
+    # running; FLASK_DEBUG overrides the configured flag
+    flask_debug = os.environ.get('FLASK_DEBUG')
+    if flask_debug is None:
+        debug = bool(config['server']['debug'])
+    else:
+        debug = flask_debug.strip().lower() in ('1', 'true', 'yes')
     
     # Initialize components
-    setup_components()
+    ctx = setup_components()
     
     # Enable CORS if configured
     if config['server'].get('cors_enabled', True):
         CORS(app)
-        logger.info("CORS enabled")
+        log.info("CORS enabled")
     
     # Start Flask server
     host = config['server']['host']
     port = config['server']['port']
-    debug = config['server']['debug']
     
-    logger.info(f"Starting web server on {host}:{port}")
+    log.info("Starting web server on %s:%s", host, port)
     print(f"\n🚀 Server starting on http://{host}:{port}")
     print(f"📡 MQTT: {config['mqtt']['broker']}:{config['mqtt']['port']}")
     print(f"🔌 Arduino: {config['serial']['port']}")
     print("=" * 60)
     
     try:
-        app.run(host=host, port=port, debug=debug)
+        run_server(host, port, debug, threads=server_threads())
     except KeyboardInterrupt:
-        logger.info("Shutting down...")
-        if serial_mgr:
-            serial_mgr.disconnect()
-        if mqtt_client:
-            mqtt_client.disconnect()
+        pass
+    finally:
+        log.info("Shutting down...")
+        if ctx.serial_mgr:
+            ctx.serial_mgr.disconnect()
+        if ctx.mqtt_client:
+            ctx.mqtt_client.disconnect()
+        if ctx.db:
+            ctx.db.flush()
         print("\n👋 Goodbye!")
 
 
@@ -3,11 +3,51 @@ Data Models Module
 Defines data structures for system entities
 """
 
-from dataclasses import dataclass, field, asdict
+import sys
+import time
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import TYPE_CHECKING, Optional, Dict, Any
 from enum import Enum
 
+import orjson
+
+if TYPE_CHECKING:
+    from database import Database
+    from mqtt_client import MQTTClient
+    from serial_manager import SerialManager
+
+
+# Slotted dataclasses drop the per-instance __dict__ (Python 3.10+)
+_SLOTS = {'slots': True} if sys.version_info >= (3, 10) else {}
+
+# (unix second, ISO string) of the most recently formatted second
+_now_iso_cache = (0, '')
+
+
+def now_iso(milliseconds: bool = False) -> str:
+    """
+    Get the current local time as an ISO 8601 string
+    
+    The date and time part is only reformatted when the second changes, so
+    hot paths can timestamp every event without allocating a datetime each time.
+    
+    Args:
+        milliseconds: Append the milliseconds instead of stopping at seconds
+    """
+    global _now_iso_cache
+    
+    now = time.time()
+    second = int(now)
+    cached_second, prefix = _now_iso_cache
+    if second != cached_second:
+        prefix = datetime.fromtimestamp(second).isoformat()
+        _now_iso_cache = (second, prefix)
+    
+    if milliseconds:
+        return f"{prefix}.{int((now - second) * 1000):03d}"
+    return prefix
+
 
 class CurtainPosition(Enum):
     """Enumeration for curtain positions"""
@@ -32,15 +72,26 @@ class SystemMode(Enum):
     AUTO = "auto"
 
 
-@dataclass
+# Value to member lookups for the position and motor callbacks; a dict hit
+# is much cheaper than going through Enum.__call__ for every message
+CURTAIN_POSITIONS = {member.value: member for member in CurtainPosition}
+MOTOR_STATES = {member.value: member for member in MotorState}
+
+
+@dataclass(**_SLOTS)
 class LightReading:
     """Light sensor reading data model"""
-    timestamp: datetime
     raw_value: int  # 0-1023 from Arduino ADC
+    ts_ns: int = field(default_factory=time.time_ns)  # Epoch nanoseconds
     calibrated_value: Optional[float] = None  # Percentage or lux
     sensor_id: str = "main_photoresistor"
     location: str = "living_room"
     
+    @property
+    def timestamp(self) -> datetime:
+        """Reading time as a local datetime, built only when asked for"""
+        return datetime.fromtimestamp(self.ts_ns / 1_000_000_000)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
         return {
@@ -54,12 +105,16 @@ class LightReading:
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'LightReading':
         """Create instance from dictionary"""
-        if isinstance(data['timestamp'], str):
-            data['timestamp'] = datetime.fromisoformat(data['timestamp'])
+        data = dict(data)
+        timestamp = data.pop('timestamp', None)
+        if timestamp is not None:
+            if isinstance(timestamp, str):
+                timestamp = datetime.fromisoformat(timestamp)
+            data['ts_ns'] = int(timestamp.timestamp() * 1_000_000) * 1000
         return cls(**data)
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class CurtainState:
     """Current state of curtain system"""
     position: CurtainPosition = CurtainPosition.UNKNOWN
@@ -68,6 +123,10 @@ class CurtainState:
     motor_speed: int = 100  # Percentage
     last_updated: datetime = field(default_factory=datetime.now)
     
+    def to_json(self) -> bytes:
+        """Serialize to JSON with the same shape as to_dict()"""
+        return orjson.dumps(self)
+    
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary for JSON serialization"""
         return {
@@ -91,7 +150,7 @@ class CurtainState:
         )
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class SystemSettings:
     """System configuration settings"""
     auto_mode_enabled: bool = False
@@ -103,7 +162,14 @@ class SystemSettings:
     
     def to_dict(self) -> Dict[str, Any]:
         """Convert to dictionary"""
-        return asdict(self)
+        return {
+            'auto_mode_enabled': self.auto_mode_enabled,
+            'threshold_dark': self.threshold_dark,
+            'threshold_bright': self.threshold_bright,
+            'hysteresis': self.hysteresis,
+            'motor_speed': self.motor_speed,
+            'motor_timeout': self.motor_timeout
+        }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'SystemSettings':
@@ -111,7 +177,7 @@ class SystemSettings:
         return cls(**{k: v for k, v in data.items() if k in cls.__annotations__})
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ArduinoStatus:
     """Arduino connection and status information"""
     connected: bool = False
@@ -137,7 +203,7 @@ class ArduinoStatus:
         }
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class MQTTStatus:
     """MQTT connection status"""
     connected: bool = False
@@ -159,7 +225,7 @@ class MQTTStatus:
         }
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class SystemStatus:
     """Overall system status"""
     arduino: ArduinoStatus = field(default_factory=ArduinoStatus)
@@ -180,9 +246,27 @@ class SystemStatus:
             'startup_time': self.startup_time.isoformat(),
             'uptime_seconds': (datetime.now() - self.startup_time).total_seconds()
         }
+    
+    def to_json(self) -> bytes:
+        """
+        Serialize to JSON with the same shape as to_dict()
+        
+        orjson encodes the nested dataclasses, enums and datetimes natively,
+        so no intermediate dictionaries are built; only the light reading goes
+        through to_dict() to format its nanosecond timestamp.
+        """
+        return orjson.dumps({
+            'arduino': self.arduino,
+            'mqtt': self.mqtt,
+            'curtain': self.curtain,
+            'settings': self.settings,
+            'latest_light': self.latest_light.to_dict() if self.latest_light else None,
+            'startup_time': self.startup_time,
+            'uptime_seconds': (datetime.now() - self.startup_time).total_seconds()
+        })
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class CurtainOperation:
     """Record of curtain operation"""
     timestamp: datetime
@@ -208,7 +292,7 @@ class CurtainOperation:
         }
 
 
-@dataclass
+@dataclass(**_SLOTS)
 class ErrorEvent:
     """System error event"""
     timestamp: datetime
@@ -227,4 +311,15 @@ class ErrorEvent:
             'component': self.component,
             'severity': self.severity,
             'resolved': self.resolved
-        } 
\ No newline at end of file
+        } 
+
+
+@dataclass(**_SLOTS)
+class AppContext:
+    """Runtime components shared by routes, callbacks and background loops"""
+    config: Dict[str, Any]
+    system_status: SystemStatus
+    serial_mgr: Optional['SerialManager'] = None
+    mqtt_client: Optional['MQTTClient'] = None
+    db: Optional['Database'] = None
+    latest_light_value: int = 0
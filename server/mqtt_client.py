@@ -4,20 +4,41 @@ Handles pub/sub messaging with MQTT broker
 """
 
 import paho.mqtt.client as mqtt
-import json
 import logging
 import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import Dict, Callable, Optional
+from typing import Any, Dict, Callable, List, Optional, Tuple
 
-from models import MQTTStatus
+import orjson
+
+from models import MQTTStatus, now_iso
+from realtime import promote_current_thread
+
+
+# Light batch payload; the outer keys are fixed, so only the values are
+# formatted in (timestamps are plain ASCII ISO strings and need no escaping)
+_LIGHT_BATCH_TEMPLATE = b'{"value":%d,"timestamp":"%s","readings":%s,"count":%d}'
 
 
 class MQTTClient:
     """MQTT client for publishing sensor data and receiving commands"""
     
+    # Outgoing messages buffered for the flusher thread; the oldest are
+    # dropped once this many are waiting
+    MAX_PENDING = 1000
+    
+    # The flusher keeps collecting for this many seconds after being woken,
+    # so bursts of messages are published in one pass
+    FLUSH_COALESCE_DELAY = 0.005
+    
+    # Longest disconnect() waits for the broker to acknowledge QoS 1 messages
+    CONFIRM_TIMEOUT = 2.0
+    
     def __init__(self, broker: str, port: int, client_id: str, topics: Dict[str, str],
-                 username: Optional[str] = None, password: Optional[str] = None):
+                 username: Optional[str] = None, password: Optional[str] = None,
+                 realtime: Optional[Dict[str, Any]] = None):
         """
         Initialize MQTT client
         
@@ -28,18 +49,50 @@ class MQTTClient:
             topics: Dictionary of topic names
             username: Optional MQTT username
             password: Optional MQTT password
+            realtime: Keyword arguments for promote_current_thread, applied
+                to the flusher thread; None keeps normal scheduling
         """
         self.broker = broker
+        self.realtime = realtime
         self.port = port
         self.client_id = client_id
         self.topics = topics
         self.logger = logging.getLogger(__name__)
         
+        # Topics resolved once instead of a dict lookup per publish
+        self._topic_light = topics.get('light_reading', 'curtain/light/reading')
+        self._topic_position = topics.get('position_status', 'curtain/position/status')
+        self._topic_system_status = topics.get('system_status', 'curtain/system/status')
+        self._topic_heartbeat = topics.get('heartbeat', 'curtain/system/heartbeat')
+        self._topic_alerts = topics.get('alerts', 'curtain/alerts/errors')
+        self._topic_control = topics.get('control_command', 'curtain/control/command')
+        
+        # Heartbeat payload skeleton; only the timestamp changes per message
+        self._heartbeat = {'timestamp': None, 'status': 'alive'}
+        
         # Create MQTT client
         self.client = mqtt.Client(client_id=client_id)
         self.status = MQTTStatus(broker=f"{broker}:{port}")
         self.callbacks: Dict[str, Callable] = {}
         
+        # The control topic is the only subscription, so its callback is kept
+        # directly to skip the dict probe per received message
+        self._control_callback: Optional[Callable] = None
+        
+        # Publishers only enqueue (topic, payload, qos); the flusher thread
+        # hands them to paho in batches, off the serial and scheduler threads
+        self._pending = deque(maxlen=self.MAX_PENDING)
+        self._pending_cv = threading.Condition()
+        self._flush_thread: Optional[threading.Thread] = None
+        self._flushing = False
+        
+        # Set while the flusher waits for work, so publishers only notify it
+        # when it is idle rather than for every message
+        self._flusher_idle = False
+        
+        # Messages evicted from a full queue since the last report
+        self._dropped = 0
+        
         # Set credentials if provided
         if username and password:
             self.client.username_pw_set(username, password)
@@ -51,15 +104,20 @@ class MQTTClient:
         
     def connect(self) -> bool:
         """
-        Connect to MQTT broker
+        Start connecting to MQTT broker in the background
+        
+        The network thread connects, and reconnects with backoff after a
+        lost connection; status.connected reflects the current state.
         
         Returns:
-            True if connection successful, False otherwise
+            True if the client was started, False otherwise
         """
         try:
             self.logger.info(f"Connecting to MQTT broker at {self.broker}:{self.port}")
-            self.client.connect(self.broker, self.port, keepalive=60)
+            self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+            self.client.connect_async(self.broker, self.port, keepalive=60)
             self.client.loop_start()
+            self._start_flusher()
             return True
         except Exception as e:
             self.logger.error(f"MQTT connection failed: {e}")
@@ -67,59 +125,181 @@ class MQTTClient:
     
     def disconnect(self):
         """Disconnect from MQTT broker"""
+        self._stop_flusher()
+        
+        # Give the last QoS 1 messages a chance to be acknowledged before
+        # the network loop stops; paho retransmits earlier ones itself
+        deadline = time.monotonic() + self.CONFIRM_TIMEOUT
+        unconfirmed = 0
+        for info in self.flush():
+            try:
+                info.wait_for_publish(timeout=max(0.0, deadline - time.monotonic()))
+            except (ValueError, RuntimeError):
+                pass
+            if not info.is_published():
+                unconfirmed += 1
+        if unconfirmed:
+            self.logger.warning(f"Disconnecting with {unconfirmed} unacknowledged messages")
+        
         self.client.loop_stop()
         self.client.disconnect()
         self.status.connected = False
         self.logger.info("Disconnected from MQTT broker")
     
-    def publish_light_reading(self, light_data: dict):
-        """Publish light sensor reading"""
-        topic = self.topics.get('light_reading', 'curtain/light/reading')
-        payload = json.dumps(light_data)
-        self.client.publish(topic, payload, qos=0)
-        self.status.messages_sent += 1
-        self.status.last_publish = datetime.now()
-        self.logger.debug(f"Published light reading: {light_data}")
-    
-    def publish_position_status(self, position: str):
-        """Publish curtain position update"""
-        topic = self.topics.get('position_status', 'curtain/position/status')
-        payload = json.dumps({
+    def _start_flusher(self):
+        """Start the background thread that publishes queued messages"""
+        if self._flush_thread and self._flush_thread.is_alive():
+            return
+        
+        self._flushing = True
+        self._flush_thread = threading.Thread(target=self._flush_loop, daemon=True, name="MQTT-Flusher")
+        self._flush_thread.start()
+    
+    def _stop_flusher(self):
+        """Stop the flusher thread, leaving any queued messages in place"""
+        with self._pending_cv:
+            self._flushing = False
+            self._pending_cv.notify()
+        
+        if self._flush_thread and self._flush_thread.is_alive():
+            self._flush_thread.join(timeout=2.0)
+    
+    def _flush_loop(self):
+        """Background thread loop publishing queued messages"""
+        if self.realtime is not None:
+            promote_current_thread("MQTT flusher", **self.realtime)
+        
+        while True:
+            with self._pending_cv:
+                while self._flushing and not self._pending:
+                    self._flusher_idle = True
+                    self._pending_cv.wait()
+                    self._flusher_idle = False
+                if not self._flushing:
+                    return
+            
+            # Let the rest of a burst arrive before publishing
+            time.sleep(self.FLUSH_COALESCE_DELAY)
+            self.flush()
+    
+    def _enqueue(self, topic: str, payload, qos: int):
+        """Queue a message for the flusher thread"""
+        if len(self._pending) >= self.MAX_PENDING:
+            # The deque drops the oldest message on append
+            self._dropped += 1
+        self._pending.append((topic, payload, qos))
+        
+        with self._pending_cv:
+            if self._flusher_idle:
+                self._pending_cv.notify()
+    
+    def flush(self) -> List[mqtt.MQTTMessageInfo]:
+        """
+        Hand every queued message to the MQTT client
+        
+        Returns:
+            Message info of the QoS 1 messages handed over, to wait on with
+            wait_for_publish() where an acknowledgement matters
+        """
+        # Drain with popleft so messages queued meanwhile are kept
+        batch = []
+        try:
+            while True:
+                batch.append(self._pending.popleft())
+        except IndexError:
+            pass
+        
+        if self._dropped:
+            self.logger.warning(f"Publish queue full, dropped {self._dropped} oldest messages")
+            self._dropped = 0
+        
+        confirms = []
+        if not batch:
+            return confirms
+        
+        sent = 0
+        for topic, payload, qos in batch:
+            try:
+                info = self.client.publish(topic, payload, qos=qos)
+            except Exception as e:
+                self.logger.error(f"Failed to publish to {topic}: {e}")
+                continue
+            
+            if qos:
+                confirms.append(info)
+            elif info.rc != mqtt.MQTT_ERR_SUCCESS:
+                # QoS 0 messages are dropped while not connected (QoS 1 ones
+                # are queued by paho)
+                continue
+            sent += 1
+        
+        # Status counters are updated once per batch rather than per message
+        if sent:
+            self.status.messages_sent += sent
+            self.status.last_publish = datetime.now()
+        
+        return confirms
+    
+    def publish_light_batch(self, readings: List[Tuple[str, int]]):
+        """
+        Publish a batch of light readings as a single message
+        
+        Telemetry is fire-and-forget: QoS 0, not retained, and never waited on,
+        so a slow broker cannot stall the caller.
+        
+        Args:
+            readings: (timestamp, value) pairs, oldest first
+        """
+        if not readings:
+            return
+        
+        # value/timestamp of the newest reading keep the single-reading shape
+        timestamp, value = readings[-1]
+        payload = _LIGHT_BATCH_TEMPLATE % (value, timestamp.encode(), orjson.dumps(readings), len(readings))
+        self._enqueue(self._topic_light, payload, 0)
+        self.logger.debug("Published %d light readings", len(readings))
+    
+    def publish_position_status(self, position: str, important: bool = False):
+        """
+        Publish curtain position update
+        
+        Args:
+            position: Curtain position
+            important: Publish with QoS 1 so the broker acknowledges it
+        """
+        payload = orjson.dumps({
             'position': position,
-            'timestamp': datetime.now().isoformat()
+            'timestamp': now_iso(milliseconds=True)
         })
-        self.client.publish(topic, payload, qos=1)
-        self.status.messages_sent += 1
-        self.status.last_publish = datetime.now()
+        self._enqueue(self._topic_position, payload, 1 if important else 0)
         self.logger.info(f"Published position: {position}")
     
-    def publish_system_status(self, status_data: dict):
-        """Publish system status"""
-        topic = self.topics.get('system_status', 'curtain/system/status')
-        payload = json.dumps(status_data)
-        self.client.publish(topic, payload, qos=1)
-        self.status.messages_sent += 1
-        self.status.last_publish = datetime.now()
+    def publish_system_status(self, status_data: dict, important: bool = False):
+        """
+        Publish system status
+        
+        Args:
+            status_data: Status to publish
+            important: Publish with QoS 1 so the broker acknowledges it
+        """
+        payload = orjson.dumps(status_data)
+        self._enqueue(self._topic_system_status, payload, 1 if important else 0)
     
     def publish_heartbeat(self):
         """Publish heartbeat message"""
-        topic = self.topics.get('heartbeat', 'curtain/system/heartbeat')
-        payload = json.dumps({
-            'timestamp': datetime.now().isoformat(),
-            'status': 'alive'
-        })
-        self.client.publish(topic, payload, qos=0)
+        heartbeat = self._heartbeat
+        heartbeat['timestamp'] = now_iso(milliseconds=True)
+        self._enqueue(self._topic_heartbeat, orjson.dumps(heartbeat), 0)
         self.logger.debug("Published heartbeat")
     
     def publish_error(self, error_message: str, error_type: str = "error"):
         """Publish error notification"""
-        topic = self.topics.get('alerts', 'curtain/alerts/errors')
-        payload = json.dumps({
-            'timestamp': datetime.now().isoformat(),
+        payload = orjson.dumps({
+            'timestamp': now_iso(milliseconds=True),
             'error_type': error_type,
             'message': error_message
         })
-        self.client.publish(topic, payload, qos=1)
+        self._enqueue(self._topic_alerts, payload, 1)
         self.logger.warning(f"Published error: {error_message}")
     
     def subscribe_control_commands(self, callback: Callable):
@@ -129,8 +309,9 @@ class MQTTClient:
         Args:
             callback: Function to call when command received
         """
-        topic = self.topics.get('control_command', 'curtain/control/command')
+        topic = self._topic_control
         self.callbacks[topic] = callback
+        self._control_callback = callback
         self.client.subscribe(topic, qos=1)
         self.logger.info(f"Subscribed to control commands on {topic}")
     
@@ -159,16 +340,20 @@ class MQTTClient:
     def _on_message(self, client, userdata, msg):
         """Callback when message received"""
         try:
-            payload = json.loads(msg.payload.decode())
-            self.logger.debug(f"Received message on {msg.topic}: {payload}")
+            payload = orjson.loads(msg.payload)
+            self.logger.debug("Received message on %s: %s", msg.topic, payload)
             
-            if msg.topic in self.callbacks:
-                self.callbacks[msg.topic](payload)
+            if msg.topic == self._topic_control and self._control_callback is not None:
+                self._control_callback(payload)
+            else:
+                callback = self.callbacks.get(msg.topic)
+                if callback is not None:
+                    callback(payload)
             
             self.status.messages_received += 1
             self.status.last_message = datetime.now()
             
-        except json.JSONDecodeError as e:
+        except orjson.JSONDecodeError as e:
             self.logger.error(f"Invalid JSON in MQTT message: {e}")
         except Exception as e:
             self.logger.error(f"Error processing MQTT message: {e}")
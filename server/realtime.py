@@ -0,0 +1,46 @@
+"""
+Realtime Scheduling Module
+Raises the priority of latency-sensitive I/O threads on Linux
+"""
+
+import logging
+import os
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+
+def promote_current_thread(name: str, priority: int = 20, cpu: Optional[int] = None) -> bool:
+    """
+    Run the calling thread under SCHED_FIFO and optionally pin it to a CPU
+    
+    Needs CAP_SYS_NICE (or root) for the scheduling policy. Without it, or on
+    platforms without these calls, the thread silently keeps normal priority.
+    
+    Args:
+        name: Thread description for log messages
+        priority: SCHED_FIFO priority (1-99)
+        cpu: CPU to pin the thread to, None to leave affinity unchanged
+        
+    Returns:
+        True if the realtime policy was applied, False otherwise
+    """
+    promoted = False
+    
+    if hasattr(os, 'sched_setscheduler'):
+        try:
+            # pid 0 is the calling thread on Linux
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+            promoted = True
+            logger.info(f"{name} thread running with SCHED_FIFO priority {priority}")
+        except OSError as e:  # PermissionError without CAP_SYS_NICE
+            logger.debug(f"{name} thread keeps normal priority: {e}")
+    
+    if cpu is not None and hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, {cpu})
+            logger.info(f"{name} thread pinned to CPU {cpu}")
+        except (OSError, ValueError) as e:
+            logger.debug(f"{name} thread not pinned to CPU {cpu}: {e}")
+    
+    return promoted
@@ -3,50 +3,103 @@ Serial Manager Module
 Handles communication with Arduino via serial connection
 """
 
+import os
+import select
 import serial
 import threading
 import time
 import logging
 import queue
 from typing import Optional, Callable, Dict, Any
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from models import ArduinoStatus, LightReading
+from realtime import promote_current_thread
 
 
 class SerialManager:
     """Manages serial communication with Arduino"""
     
-    def __init__(self, port: str, baudrate: int = 115200, timeout: float = 2.0):
+    # Longest line accepted from the Arduino before the receive buffer is reset
+    MAX_LINE_LENGTH = 4096
+    
+    # Upper bound for the Arduino to boot after the port opens and announce
+    # its mode; the actual wait ends as soon as the first MODE line arrives
+    READY_TIMEOUT = 3.0
+    
+    # Longest a blocking read may wait, so the read thread notices a
+    # disconnect promptly even when the Arduino is silent
+    READ_TIMEOUT = 0.1
+    
+    # Largest chunk taken from the serial file descriptor per read
+    READ_CHUNK_SIZE = 4096
+    
+    # Commands queued within this many seconds of each other are sent in a
+    # single write
+    TX_COALESCE_DELAY = 0.002
+    
+    def __init__(self, port: str, baudrate: int = 115200, timeout: float = 2.0,
+                 realtime: Optional[Dict[str, Any]] = None):
         """
         Initialize serial manager
         
         Args:
             port: Serial port path
             baudrate: Communication baudrate
-            timeout: Read timeout in seconds
+            timeout: Read timeout in seconds, capped at READ_TIMEOUT
+            realtime: Keyword arguments for promote_current_thread, applied
+                to the read thread; None keeps normal scheduling
         """
         self.port = port
         self.baudrate = baudrate
         self.timeout = timeout
+        self.realtime = realtime
         self.serial_conn: Optional[serial.Serial] = None
         self.connected = False
         self.logger = logging.getLogger(__name__)
         
         # Threading
         self.read_thread: Optional[threading.Thread] = None
+        self.tx_thread: Optional[threading.Thread] = None
         self.should_run = False
         self.lock = threading.Lock()
         
-        # Command queue
-        self.command_queue = queue.Queue()
+        # Encoded commands waiting for the transmit thread; None stops it
+        self._tx_queue = queue.SimpleQueue()
         
         # Callbacks for different message types
         self.callbacks: Dict[str, Callable] = {}
         
+        # Message type -> handler; a single dict lookup replaces the
+        # comparison ladder for every received line
+        self._handlers: Dict[str, Callable[[str], None]] = {
+            "LIGHT": self._handle_light_reading,
+            "POSITION": self._handle_position_update,
+            "MOTOR": self._handle_motor_status,
+            "MODE": self._handle_mode_update,
+            "CALIBRATION": self._handle_calibration_data,
+            "ERROR": self._handle_error,
+            "STATUS": self._handle_status_message,
+            "READY": self._handle_ready_message,
+            "VERSION": self._handle_version,
+            "UPTIME": self._handle_uptime,
+            "PONG": self._handle_pong,
+        }
+        
+        # Set by the read thread on the first MODE line after connecting
+        self.ready_event = threading.Event()
+        
         # Arduino status
         self.status = ArduinoStatus(port=port)
         
+        # time.monotonic() of the last received data; status.last_seen is
+        # only derived from it when the status is requested
+        self._last_seen_mono: Optional[float] = None
+        
+        # File descriptor of the open port, read directly where the
+        # platform provides one
+        self._fd: Optional[int] = None
+        
     def connect(self) -> bool:
         """
         Establish serial connection to Arduino
@@ -57,36 +110,36 @@ class SerialManager:
         try:
             self.logger.info(f"Attempting to connect to {self.port} at {self.baudrate} baud")
             
+            self.ready_event.clear()
             self.serial_conn = serial.Serial(
                 port=self.port,
                 baudrate=self.baudrate,
-                timeout=self.timeout,
+                timeout=min(self.timeout, self.READ_TIMEOUT),
                 write_timeout=1.0
             )
+            self._enable_low_latency()
             
-            # Wait for Arduino to reset
-            time.sleep(2)
+            try:
+                self._fd = self.serial_conn.fileno()
+            except (AttributeError, OSError):
+                # Not available on Windows; reads go through pyserial
+                self._fd = None
             
-            # Clear any startup messages
+            # Drop anything received before the port was opened; the boot
+            # banner of the Arduino (which resets on open) arrives afterwards
             self.serial_conn.reset_input_buffer()
             self.serial_conn.reset_output_buffer()
             
             self.connected = True
             self.status.connected = True
             self.status.last_seen = datetime.now()
+            self._last_seen_mono = time.monotonic()
             
             self.logger.info(f"Connected to Arduino on {self.port}")
             
-            # Start read thread
+            # Start read and transmit threads
             self.start_reading()
-            
-            # Set initial mode to MANUAL to match server expectation
-            time.sleep(0.5)
-            self.send_command("MANUAL_MODE")
-            time.sleep(0.2)
-            
-            # Request initial status
-            self.send_command("GET_STATUS")
+            self._start_transmitting()
             
             return True
             
@@ -101,13 +154,49 @@ class SerialManager:
             self.status.connected = False
             return False
     
+    def _enable_low_latency(self):
+        """
+        Ask the driver to deliver received bytes immediately
+        
+        On Linux this sets ASYNC_LOW_LATENCY, which for USB-serial adapters such
+        as FTDI drops the receive latency from 16 ms to about 1 ms. Drivers and
+        platforms without support are left at their defaults.
+        """
+        set_low_latency_mode = getattr(self.serial_conn, 'set_low_latency_mode', None)
+        if set_low_latency_mode is None:
+            return
+        
+        try:
+            set_low_latency_mode(True)
+            self.logger.debug("Enabled low latency mode")
+        except (NotImplementedError, OSError, ValueError) as e:
+            self.logger.debug(f"Low latency mode not supported on {self.port}: {e}")
+    
+    def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for the Arduino to announce itself after connecting
+        
+        Args:
+            timeout: Seconds to wait, defaults to READY_TIMEOUT
+            
+        Returns:
+            True if a MODE line was received in time, False otherwise
+        """
+        return self.ready_event.wait(self.READY_TIMEOUT if timeout is None else timeout)
+    
     def disconnect(self):
         """Close serial connection"""
         self.should_run = False
+        self.ready_event.clear()
         
         if self.read_thread and self.read_thread.is_alive():
             self.read_thread.join(timeout=2.0)
         
+        # Let queued commands go out before the port closes
+        if self.tx_thread and self.tx_thread.is_alive():
+            self._tx_queue.put(None)
+            self.tx_thread.join(timeout=2.0)
+        
         if self.serial_conn and self.serial_conn.is_open:
             try:
                 self.serial_conn.close()
@@ -131,17 +220,49 @@ class SerialManager:
     
     def _read_loop(self):
         """Background thread loop for reading serial data"""
+        if self.realtime is not None:
+            promote_current_thread("Serial read", **self.realtime)
+        
+        buffer = bytearray()
+        
         while self.should_run and self.connected:
             try:
-                if self.serial_conn and self.serial_conn.in_waiting > 0:
-                    line = self.serial_conn.readline().decode('utf-8', errors='ignore').strip()
+                if not self.serial_conn:
+                    time.sleep(0.01)
+                    continue
+                
+                chunk = self._read_chunk()
+                if not chunk:
+                    continue
+                buffer += chunk
+                
+                newline = buffer.find(b'\n')
+                if newline >= 0:
+                    # Decode each complete line straight out of the buffer
+                    # through a memoryview, then drop all of them at once,
+                    # instead of copying and shifting the buffer per line
+                    start = 0
+                    try:
+                        with memoryview(buffer) as view:
+                            while newline >= 0:
+                                # The protocol is plain ASCII, which decodes faster than UTF-8
+                                line = str(view[start:newline], 'ascii', 'ignore').strip()
+                                start = newline + 1
+                                
+                                if line:
+                                    self.logger.debug("Received: %s", line)
+                                    self._process_message(line)
+                                
+                                newline = buffer.find(b'\n', start)
+                    finally:
+                        del buffer[:start]
                     
-                    if line:
-                        self.logger.debug(f"Received: {line}")
-                        self._process_message(line)
-                        self.status.last_seen = datetime.now()
+                    self._last_seen_mono = time.monotonic()
                 
-                time.sleep(0.01)  # Small delay to prevent CPU spinning
+                # Drop unterminated garbage rather than growing without bound
+                if len(buffer) > self.MAX_LINE_LENGTH:
+                    self.logger.warning(f"Discarding {len(buffer)} bytes without line terminator")
+                    buffer.clear()
                 
             except serial.SerialException as e:
                 self.logger.error(f"Serial read error: {e}")
@@ -151,6 +272,84 @@ class SerialManager:
             except Exception as e:
                 self.logger.error(f"Unexpected error in read loop: {e}")
     
+    def _read_chunk(self) -> bytes:
+        """
+        Read whatever the driver has received, waiting up to READ_TIMEOUT
+        
+        Returns:
+            The received bytes, empty if nothing arrived in time
+        """
+        fd = self._fd
+        if fd is None:
+            # Read everything already buffered by the driver in one call,
+            # blocking for up to the read timeout when nothing is waiting;
+            # a larger fixed size would block until it filled up
+            return self.serial_conn.read(self.serial_conn.in_waiting or 1)
+        
+        # Wait on the descriptor itself, which wakes up as soon as bytes
+        # arrive and skips pyserial's in_waiting ioctl and read overhead
+        try:
+            readable, _, _ = select.select([fd], [], [], self.READ_TIMEOUT)
+            if not readable:
+                return b''
+            chunk = os.read(fd, self.READ_CHUNK_SIZE)
+        except BlockingIOError:
+            return b''
+        except OSError as e:
+            raise serial.SerialException(f"read failed: {e}") from e
+        
+        if not chunk:
+            # Readable without data means the device went away
+            raise serial.SerialException("device reports readiness to read but returned no data")
+        return chunk
+    
+    def _start_transmitting(self):
+        """Start background thread to write queued commands"""
+        if self.tx_thread and self.tx_thread.is_alive():
+            return
+        
+        self.tx_thread = threading.Thread(target=self._tx_loop, daemon=True, name="Serial-TX")
+        self.tx_thread.start()
+    
+    def _tx_loop(self):
+        """Background thread loop writing queued commands in batches"""
+        running = True
+        
+        while running:
+            command = self._tx_queue.get()
+            if command is None:
+                break
+            
+            # Collect the rest of a burst into the same write
+            data = bytearray(command)
+            deadline = time.monotonic() + self.TX_COALESCE_DELAY
+            while True:
+                try:
+                    command = self._tx_queue.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if command is None:
+                    running = False
+                    break
+                data += command
+            
+            if not self.connected or not self.serial_conn:
+                self.logger.warning(f"Dropping {len(data)} bytes of commands: Not connected")
+                continue
+            
+            try:
+                with self.lock:
+                    self.serial_conn.write(data)
+                    self.serial_conn.flush()
+                self.logger.debug("Sent commands: %r", bytes(data))
+                
+            except serial.SerialException as e:
+                self.logger.error(f"Error sending command: {e}")
+                self.connected = False
+                self.status.connected = False
+            except Exception as e:
+                self.logger.error(f"Unexpected error sending command: {e}")
+    
     def _process_message(self, message: str):
         """
         Process received message from Arduino
@@ -160,40 +359,22 @@ class SerialManager:
         """
         try:
             # Parse message format: "TYPE:VALUE" or "TYPE:KEY1:VAL1,KEY2:VAL2"
-            if ':' not in message:
+            msg_type, separator, msg_data = message.partition(':')
+            if not separator:
                 return
             
-            parts = message.split(':', 1)
-            msg_type = parts[0].upper()
-            msg_data = parts[1] if len(parts) > 1 else ""
-            
-            # Route message to appropriate handler
-            if msg_type == "LIGHT":
-                self._handle_light_reading(msg_data)
-            elif msg_type == "POSITION":
-                self._handle_position_update(msg_data)
-            elif msg_type == "MOTOR":
-                self._handle_motor_status(msg_data)
-            elif msg_type == "MODE":
-                self._handle_mode_update(msg_data)
-            elif msg_type == "CALIBRATION":
-                self._handle_calibration_data(msg_data)
-            elif msg_type == "ERROR":
-                self._handle_error(msg_data)
-            elif msg_type == "STATUS":
-                self._handle_status_message(msg_data)
-            elif msg_type == "READY":
-                self._handle_ready_message(msg_data)
-            elif msg_type == "VERSION":
-                self.status.firmware_version = msg_data
-            elif msg_type == "UPTIME":
-                self.status.uptime_ms = int(msg_data)
-            elif msg_type == "PONG":
-                self.logger.debug("Received PONG")
+            # Route message to its handler; handlers invoke their own
+            # callbacks with the parsed value, so only message types without
+            # a handler get the raw data passed to a registered callback.
+            # The firmware sends upper case types, so upper() is only needed
+            # when the direct lookup misses.
+            handler = self._handlers.get(msg_type)
+            if handler is None:
+                msg_type = msg_type.upper()
+                handler = self._handlers.get(msg_type) or self.callbacks.get(msg_type)
             
-            # Call registered callbacks
-            if msg_type in self.callbacks:
-                self.callbacks[msg_type](msg_data)
+            if handler is not None:
+                handler(msg_data)
                 
         except Exception as e:
             self.logger.error(f"Error processing message '{message}': {e}")
@@ -202,10 +383,11 @@ class SerialManager:
         """Handle light sensor reading"""
         try:
             value = int(data)
-            self.logger.debug(f"Light reading: {value}")
+            self.logger.debug("Light reading: %s", value)
             
-            if "LIGHT" in self.callbacks:
-                self.callbacks["LIGHT"](value)
+            callback = self.callbacks.get("LIGHT")
+            if callback is not None:
+                callback(value)
                 
         except ValueError:
             self.logger.error(f"Invalid light value: {data}")
@@ -233,6 +415,8 @@ class SerialManager:
             self.callbacks["MODE"](mode.lower())
         else:
             self.logger.warning("No MODE callback registered!")
+        
+        self.ready_event.set()
     
     def _handle_calibration_data(self, data: str):
         """Handle calibration information"""
@@ -244,9 +428,9 @@ class SerialManager:
                 if part == "YES":
                     self.status.calibrated = True
                 elif part.startswith("MIN:"):
-                    self.status.light_min = int(part.split(':')[1])
+                    self.status.light_min = int(part[4:])
                 elif part.startswith("MAX:"):
-                    self.status.light_max = int(part.split(':')[1])
+                    self.status.light_max = int(part[4:])
                     
             self.logger.info(f"Calibration: {self.status.calibrated}, "
                            f"Range: {self.status.light_min}-{self.status.light_max}")
@@ -270,42 +454,39 @@ class SerialManager:
         self.logger.info(f"Arduino ready: {data}")
         self.status.firmware_version = data if data else "unknown"
     
+    def _handle_version(self, data: str):
+        """Handle firmware version report"""
+        self.status.firmware_version = data
+    
+    def _handle_uptime(self, data: str):
+        """Handle uptime report in milliseconds"""
+        self.status.uptime_ms = int(data)
+    
+    def _handle_pong(self, data: str):
+        """Handle ping response"""
+        self.logger.debug("Received PONG")
+    
     def send_command(self, command: str, params: Optional[str] = None) -> bool:
         """
         Send command to Arduino
         
+        The command is queued for the transmit thread, which writes bursts of
+        commands with a single write and flush, in the order they were sent.
+        
         Args:
             command: Command string
             params: Optional parameters
             
         Returns:
-            True if sent successfully, False otherwise
+            True if queued for sending, False if not connected
         """
         if not self.connected or not self.serial_conn:
             self.logger.warning(f"Cannot send command '{command}': Not connected")
             return False
         
-        try:
-            with self.lock:
-                # Format command
-                cmd = f"{command}:{params}" if params else command
-                cmd += "\n"
-                
-                # Send command
-                self.serial_conn.write(cmd.encode('utf-8'))
-                self.serial_conn.flush()
-                
-                self.logger.debug(f"Sent command: {cmd.strip()}")
-                return True
-                
-        except serial.SerialException as e:
-            self.logger.error(f"Error sending command: {e}")
-            self.connected = False
-            self.status.connected = False
-            return False
-        except Exception as e:
-            self.logger.error(f"Unexpected error sending command: {e}")
-            return False
+        cmd = f"{command}:{params}\n" if params else f"{command}\n"
+        self._tx_queue.put(cmd.encode('utf-8'))
+        return True
     
     def register_callback(self, message_type: str, callback: Callable):
         """
@@ -374,7 +555,10 @@ class SerialManager:
         return self.send_command("PING")
     
     def get_arduino_status(self) -> ArduinoStatus:
-        """Get current Arduino status"""
+        """Get current Arduino status, with last_seen brought up to date"""
+        last_seen_mono = self._last_seen_mono
+        if last_seen_mono is not None:
+            self.status.last_seen = datetime.now() - timedelta(seconds=time.monotonic() - last_seen_mono)
         return self.status
     
     def is_connected(self) -> bool:
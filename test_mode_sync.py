@@ -3,12 +3,19 @@
 Test script to verify mode synchronization between server and Arduino
 """
 
+import orjson
 import requests
+from requests.adapters import HTTPAdapter
 import time
 import sys
 
 BASE_URL = "http://localhost:5000"
 
+# One keep-alive connection shared by all requests
+SESSION = requests.Session()
+SESSION.headers['Content-Type'] = 'application/json'
+SESSION.mount("http://", HTTPAdapter(pool_connections=1, pool_maxsize=1))
+
 def print_status(msg):
     """Print status message"""
     print(f"\n{'='*60}")
@@ -18,7 +25,7 @@ def print_status(msg):
 def get_system_status():
     """Get current system status"""
     try:
-        response = requests.get(f"{BASE_URL}/api/v1/system/status")
+        response = SESSION.get(f"{BASE_URL}/api/v1/system/status")
         if response.ok:
             return response.json()
         else:
@@ -31,9 +38,9 @@ def get_system_status():
 def set_mode(mode):
     """Set curtain mode"""
     try:
-        response = requests.post(
+        response = SESSION.post(
             f"{BASE_URL}/api/v1/curtain/mode",
-            json={"mode": mode}
+            data=orjson.dumps({"mode": mode})
         )
         return response.json()
     except Exception as e: